@@ -0,0 +1,86 @@
+from operator import eq
+from models import db, Question
+from catalog_cache import get_quiz_version
+
+# Answer keys kept per process; each is tagged with the quiz content version
+# it was read at and reloaded once a write to the quiz bumps the version
+ANSWER_KEY_CACHE_SIZE = 1024
+# A chosen option that never equals a key entry (unanswered questions)
+UNANSWERED = 0xFF
+
+_answer_keys = {}
+
+
+class AnswerKey:
+    """
+    A quiz's correct options as one byte per question, in question id order.
+
+    Questions without a valid correct option hold 0, which no answer matches.
+    """
+    __slots__ = ('question_ids', 'options', 'positions')
+
+    def __init__(self, question_ids, options):
+        self.question_ids = question_ids
+        self.options = options
+        self.positions = {question_id: i for i, question_id in enumerate(question_ids)}
+
+    def __len__(self):
+        return len(self.options)
+
+    def grade(self, answers):
+        """
+        Number of correct answers in a {question_id: chosen option} mapping.
+
+        Raises ValueError for a question outside the quiz or an option
+        other than 1-4. Unanswered questions count as wrong.
+        """
+        chosen = bytearray([UNANSWERED]) * len(self.options)
+        for question_id, option in answers.items():
+            position = self.positions.get(int(question_id))
+            if position is None:
+                raise ValueError(f'Question {question_id} is not part of this quiz')
+            if option is None:
+                continue
+            # JSON true == 1 and 1.0 == 1, so check the type as well as the value
+            if type(option) is not int or not 1 <= option <= 4:
+                raise ValueError(f'Invalid option for question {question_id}: use 1-4')
+            chosen[position] = option
+        # Byte-wise comparison of the two arrays, no per-question objects
+        return sum(map(eq, self.options, chosen))
+
+    def as_dict(self):
+        return {question_id: option or None for question_id, option in zip(self.question_ids, self.options)}
+
+
+def load_answer_key(quiz_id):
+    rows = db.session.query(Question.id, Question.correct_option).filter(
+        Question.quiz_id == quiz_id
+    ).order_by(Question.id).all()
+    return AnswerKey(
+        tuple(question_id for question_id, _ in rows),
+        bytes(option if option in (1, 2, 3, 4) else 0 for _, option in rows)
+    )
+
+
+def get_answer_key(quiz_id):
+    """
+    The quiz's answer key, read from the database only when questions changed since it was cached.
+
+    A quiz that does not exist gets an empty key.
+    """
+    # Read the version before the questions: a key loaded while a write
+    # commits is then filed under the older version and reloaded next time
+    version = get_quiz_version(quiz_id)
+    if version is None:
+        _answer_keys.pop(quiz_id, None)
+        return AnswerKey((), b'')
+
+    cached = _answer_keys.get(quiz_id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    answer_key = load_answer_key(quiz_id)
+    if len(_answer_keys) >= ANSWER_KEY_CACHE_SIZE:
+        _answer_keys.clear()
+    _answer_keys[quiz_id] = (version, answer_key)
+    return answer_key
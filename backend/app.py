@@ -11,6 +11,8 @@ from score_routes import score_bp
 from summary_routes import summary_bp
 from scheduled_jobs_routes import scheduled_jobs_bp
 from export_routes import export_bp
+from leaderboard_routes import leaderboard_bp
+from catalog_change_routes import catalog_change_bp
 from flask_migrate import Migrate
 from flask_cors import CORS, cross_origin
 from celery_init import celery_init_app
@@ -46,6 +48,8 @@ app.register_blueprint(score_bp)
 app.register_blueprint(summary_bp)
 app.register_blueprint(scheduled_jobs_bp)
 app.register_blueprint(export_bp)
+app.register_blueprint(leaderboard_bp)
+app.register_blueprint(catalog_change_bp)
 
 with app.app_context():
     db.create_all()
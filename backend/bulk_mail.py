@@ -0,0 +1,82 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from mail_transport import SMTP_POOL_SIZE, build_message, smtp_pool
+
+BULK_EMAIL_CONCURRENCY = int(os.getenv('BULK_EMAIL_CONCURRENCY', SMTP_POOL_SIZE))
+# Messages per second to any one recipient domain; 0 disables the limit
+BULK_EMAIL_DOMAIN_RATE = float(os.getenv('BULK_EMAIL_DOMAIN_RATE', 20))
+PROGRESS_EVERY = 100
+
+
+def recipient_domain(email):
+    return email.rpartition('@')[2].lower()
+
+
+class DomainRateLimiter:
+    """Spaces out sends to the same domain so no domain gets more than `rate` messages a second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = {}
+
+    async def wait(self, domain):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot.get(domain, now))
+        self._next_slot[domain] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def dispatch_emails(messages, pool, concurrency, domain_rate, progress=None):
+    """
+    Send (to_email, subject, html_content) messages with at most `concurrency` in flight.
+
+    The SMTP sessions are blocking, so each send runs on a worker thread over
+    the shared pool while the event loop handles scheduling, per-domain rate
+    limits and progress.
+    """
+    messages = list(messages)
+    total = len(messages)
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = DomainRateLimiter(domain_rate)
+    loop = asyncio.get_running_loop()
+    summary = {'total': total, 'sent': 0, 'failed': 0, 'failures': []}
+
+    def finished():
+        done = summary['sent'] + summary['failed']
+        if progress and (done % PROGRESS_EVERY == 0 or done == total):
+            progress(done, total)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def deliver(index, to_email, subject, html_content):
+            # Wait out the domain's rate limit before taking a send slot
+            await limiter.wait(recipient_domain(to_email))
+            async with semaphore:
+                try:
+                    await loop.run_in_executor(
+                        executor, pool.send, build_message(to_email, subject, html_content)
+                    )
+                    summary['sent'] += 1
+                except Exception as e:
+                    summary['failed'] += 1
+                    summary['failures'].append({'index': index, 'email': to_email, 'error': str(e)})
+            finished()
+
+        await asyncio.gather(*(deliver(i, *message) for i, message in enumerate(messages)))
+
+    return summary
+
+
+def send_bulk_email(messages, pool=None, concurrency=BULK_EMAIL_CONCURRENCY,
+                    domain_rate=BULK_EMAIL_DOMAIN_RATE, progress=None):
+    """
+    Send many emails concurrently from synchronous code (e.g. a Celery task).
+
+    progress(done, total) is called every PROGRESS_EVERY messages and at the
+    end. Returns {'total', 'sent', 'failed', 'failures'}; each failure
+    carries the message's index in `messages`.
+    """
+    return asyncio.run(dispatch_emails(messages, pool or smtp_pool, concurrency, domain_rate, progress))
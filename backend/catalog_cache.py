@@ -0,0 +1,153 @@
+from flask import request, make_response, Response
+from functools import wraps
+from sqlalchemy import event, update, inspect
+from sqlalchemy.orm import Session
+from models import db, Subject, Chapter, Quiz, Question
+from redis_store import cache_store
+
+CATALOG_MODELS = (Subject, Chapter, Quiz, Question)
+CATALOG_VERSION_KEY = "catalog_version"
+# Entries are keyed by catalog version, so they never go stale; the expiry
+# only reclaims memory held by versions nobody asks for any more.
+CATALOG_CACHE_EXPIRE_SECONDS = 3600
+# Redis copy of quiz.content_version for ETag checks. It is deleted after
+# every commit that changes the quiz; the expiry bounds how long a copy
+# written by a read that raced such a commit (or a failed delete) can live
+QUIZ_VERSION_CACHE_SECONDS = 30
+
+quizzes = Quiz.__table__
+
+
+def get_catalog_version():
+    """Current catalog version, or None when Redis is unavailable"""
+    version = cache_store.execute(lambda r: r.get(CATALOG_VERSION_KEY) or 0)
+    return int(version) if version is not None else None
+
+
+def bump_catalog_version():
+    cache_store.execute(lambda r: r.incr(CATALOG_VERSION_KEY))
+
+
+def get_quiz_version(quiz_id):
+    """
+    Content version of one quiz and its questions, or None if the quiz does not exist.
+
+    Read from the quiz row, so it is never behind a committed write. The
+    creation time is part of it: a quiz recreated under a reused id does
+    not share a version with the one it replaced.
+    """
+    row = db.session.query(Quiz.created_at, Quiz.content_version).filter(Quiz.id == quiz_id).first()
+    if row is None:
+        return None
+    created = int(row.created_at.timestamp() * 1000) if row.created_at else 0
+    return f"{created}.{row.content_version}"
+
+
+def quiz_version_key(quiz_id):
+    return f"quiz_version:{quiz_id}"
+
+
+def cached_quiz_version(quiz_id):
+    """
+    get_quiz_version() through its Redis copy, for revalidation that should
+    not touch the database. Answer keys use get_quiz_version() directly.
+    """
+    key = quiz_version_key(quiz_id)
+    version = cache_store.lookup(lambda r: r.get(key))
+    if version is not None:
+        return version
+
+    version = get_quiz_version(quiz_id)
+    # Nothing is cached for unknown quizzes, so probing random ids leaves no keys
+    if version is not None:
+        cache_store.execute(lambda r: r.set(key, version, ex=QUIZ_VERSION_CACHE_SECONDS, nx=True))
+    return version
+
+
+def forget_quiz_versions(quiz_ids):
+    """Drop the Redis copies of the given quizzes' versions; call after the change commits"""
+    if quiz_ids:
+        cache_store.execute(lambda r: r.delete(*[quiz_version_key(quiz_id) for quiz_id in quiz_ids]))
+
+
+def bump_quiz_versions(connection, quiz_ids):
+    """Raise the content version of the given quizzes inside the caller's transaction"""
+    if quiz_ids:
+        connection.execute(
+            update(quizzes).where(quizzes.c.id.in_(quiz_ids)).values(
+                content_version=quizzes.c.content_version + 1
+            )
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def track_catalog_changes(session, flush_context):
+    """
+    Remember whether this transaction wrote any Subject/Chapter/Quiz/Question
+    row, and raise the content version of the quizzes it touched in the same
+    transaction.
+    """
+    changed = [
+        *session.new,
+        *session.deleted,
+        *(obj for obj in session.dirty if session.is_modified(obj))
+    ]
+    if any(isinstance(obj, CATALOG_MODELS) for obj in changed):
+        session.info['catalog_changed'] = True
+
+    # New quizzes start at version 1; a question moved between quizzes changes both
+    quiz_ids = {obj.id for obj in changed if isinstance(obj, Quiz) and obj not in session.new}
+    for obj in changed:
+        if isinstance(obj, Question):
+            quiz_ids.add(obj.quiz_id)
+            quiz_ids.update(inspect(obj).attrs.quiz_id.history.deleted)
+    quiz_ids.discard(None)
+    bump_quiz_versions(session.connection(), quiz_ids)
+    if quiz_ids:
+        session.info.setdefault('changed_quizzes', set()).update(quiz_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def publish_catalog_changes(session):
+    if session.info.pop('catalog_changed', False):
+        bump_catalog_version()
+    forget_quiz_versions(session.info.pop('changed_quizzes', None))
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_catalog_changes(session):
+    session.info.pop('catalog_changed', None)
+    session.info.pop('changed_quizzes', None)
+
+
+def catalog_cache_key(version):
+    """Cache key built from the catalog version, the endpoint, its path and query args"""
+    args = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return f"catalog_cache:{version}:{request.endpoint}:{request.path}?{args}"
+
+
+def cached_catalog_response(view):
+    """
+    Cache successful JSON responses of a catalog read endpoint per catalog version.
+
+    Apply it below any authorization checks: a cache hit returns the stored
+    body without running the view.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = get_catalog_version()
+        if version is None:
+            return view(*args, **kwargs)
+
+        cache_key = catalog_cache_key(version)
+        cached_body = cache_store.lookup(lambda r: r.get(cache_key))
+        if cached_body is not None:
+            return Response(cached_body, mimetype='application/json')
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            body = response.get_data(as_text=True)
+            cache_store.execute(lambda r: r.setex(cache_key, CATALOG_CACHE_EXPIRE_SECONDS, body))
+        return response
+
+    return wrapper
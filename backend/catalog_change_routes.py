@@ -0,0 +1,101 @@
+from flask import Blueprint, request, jsonify
+from models import db, Subject, Chapter, Quiz, Question, CatalogChange
+from pagination import format_value, DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
+from catalog_changes import catalog_change_bounds, settled_catalog_version
+from subject_routes import SUBJECT_LIST_COLUMNS
+from chapter_routes import CHAPTER_LIST_COLUMNS
+from quiz_routes import QUIZ_LIST_COLUMNS, QUIZ_LIST_FORMATTERS
+from question_routes import QUESTION_PUBLIC_COLUMNS
+
+catalog_change_bp = Blueprint('catalog_change_bp', __name__)
+
+# Entity type -> (response key, listing columns, formatters, primary key)
+CATALOG_ENTITIES = {
+    'subject': ('subjects', SUBJECT_LIST_COLUMNS, {}, Subject.id),
+    'chapter': ('chapters', CHAPTER_LIST_COLUMNS, {}, Chapter.id),
+    'quiz': ('quizzes', QUIZ_LIST_COLUMNS, QUIZ_LIST_FORMATTERS, Quiz.id),
+    'question': ('questions', QUESTION_PUBLIC_COLUMNS, {}, Question.id)
+}
+
+def load_entities(entity_type, entity_ids):
+    """Current rows of the given entities, serialized like the listing endpoints, keyed by id"""
+    _, columns, formatters, key_column = CATALOG_ENTITIES[entity_type]
+    rows = db.session.query(
+        *[column.label(name) for name, column in columns.items()]
+    ).filter(key_column.in_(entity_ids)).all()
+    return {
+        row.id: {name: formatters.get(name, format_value)(getattr(row, name)) for name in columns}
+        for row in rows
+    }
+
+@catalog_change_bp.route('/catalog/changes', methods=['GET'])
+def get_catalog_changes():
+    """
+    Subjects, chapters, quizzes and questions created, updated or deleted after version ?since=.
+
+    Without since, only the current version is returned: take it before a
+    full fetch and pass it as since on the next sync. Up to ?limit= change
+    records are read per call; when has_more is set, call again with
+    since=version. Versions stop CATALOG_CHANGE_LAG_SECONDS behind the
+    newest changes so none is skipped while it commits. Questions are
+    returned without their correct option.
+    """
+    try:
+        connection = db.session.connection()
+        oldest, current = catalog_change_bounds(connection)
+        current = settled_catalog_version(connection, current)
+        since = request.args.get('since')
+        if since is None:
+            return jsonify({'version': current, 'oldest_version': oldest}), 200
+
+        try:
+            since = int(since)
+            limit = int(request.args.get('limit', DEFAULT_PAGE_LIMIT))
+        except ValueError:
+            return jsonify({'error': 'since and limit must be integers'}), 400
+        if limit < 1 or limit > MAX_PAGE_LIMIT:
+            return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_LIMIT}'}), 400
+
+        if oldest and since < oldest - 1:
+            return jsonify({
+                'error': 'Changes after this version were pruned; refetch the catalog',
+                'version': current
+            }), 410
+
+        records = db.session.query(
+            CatalogChange.id, CatalogChange.entity_type, CatalogChange.entity_id, CatalogChange.action
+        ).filter(
+            CatalogChange.id > since, CatalogChange.id <= current
+        ).order_by(CatalogChange.id).limit(limit + 1).all()
+        has_more = len(records) > limit
+        records = records[:limit]
+
+        # Several writes to one entity collapse into its net change
+        touched = {entity_type: {} for entity_type in CATALOG_ENTITIES}
+        for record in records:
+            entity = touched[record.entity_type]
+            first_action = entity.get(record.entity_id, (record.action,))[0]
+            entity[record.entity_id] = (first_action, record.action)
+
+        changes = {}
+        for entity_type, entity in touched.items():
+            current_rows = load_entities(entity_type, list(entity)) if entity else {}
+            result = {'created': [], 'updated': [], 'deleted': []}
+            for entity_id, (first_action, last_action) in entity.items():
+                row = current_rows.get(entity_id)
+                if last_action == 'deleted' or row is None:
+                    result['deleted'].append(entity_id)
+                elif first_action == 'created':
+                    result['created'].append(row)
+                else:
+                    result['updated'].append(row)
+            changes[CATALOG_ENTITIES[entity_type][0]] = result
+
+        return jsonify({
+            'since': since,
+            'version': records[-1].id if records else min(since, current),
+            'has_more': has_more,
+            'changes': changes
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
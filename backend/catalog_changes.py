@@ -0,0 +1,79 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, delete, select, func
+from sqlalchemy.orm import Session
+from models import Subject, Chapter, Quiz, Question, CatalogChange
+
+# Changes older than this are pruned; clients further behind must refetch everything
+CATALOG_CHANGE_RETENTION_DAYS = int(os.getenv('CATALOG_CHANGE_RETENTION_DAYS', 30))
+# Change ids are taken at flush but rows become visible at commit, so on a
+# server database a lower id can appear after a higher one. Readers only go
+# up to changes at least this old, by when their transactions have committed
+CATALOG_CHANGE_LAG_SECONDS = int(os.getenv('CATALOG_CHANGE_LAG_SECONDS', 10))
+
+ENTITY_TYPES = {
+    Subject: 'subject',
+    Chapter: 'chapter',
+    Quiz: 'quiz',
+    Question: 'question'
+}
+
+changes = CatalogChange.__table__
+
+
+def log_catalog_changes(connection, entity_type, entity_ids, action):
+    """Append one change row per entity; for writers that bypass the ORM (bulk inserts)"""
+    now = datetime.utcnow()
+    rows = [
+        {'entity_type': entity_type, 'entity_id': entity_id, 'action': action, 'changed_at': now}
+        for entity_id in entity_ids
+    ]
+    if rows:
+        connection.execute(insert(changes), rows)
+
+
+@event.listens_for(Session, "after_flush")
+def record_catalog_changes(session, flush_context):
+    """Log this flush's Subject/Chapter/Quiz/Question writes inside the same transaction"""
+    now = datetime.utcnow()
+    rows = []
+    for objects, action in (
+        (session.new, 'created'),
+        ((obj for obj in session.dirty if session.is_modified(obj)), 'updated'),
+        (session.deleted, 'deleted')
+    ):
+        for obj in objects:
+            entity_type = ENTITY_TYPES.get(type(obj))
+            if entity_type:
+                rows.append({
+                    'entity_type': entity_type, 'entity_id': obj.id,
+                    'action': action, 'changed_at': now
+                })
+
+    if rows:
+        session.connection().execute(insert(changes), rows)
+
+
+def catalog_change_bounds(connection):
+    """(oldest retained version, current version); both 0 before the first change"""
+    oldest, current = connection.execute(select(func.min(changes.c.id), func.max(changes.c.id))).one()
+    return oldest or 0, current or 0
+
+
+def settled_catalog_version(connection, current, lag_seconds=CATALOG_CHANGE_LAG_SECONDS):
+    """The highest version below every change younger than lag_seconds; changes up to it are safe to hand out"""
+    cutoff = datetime.utcnow() - timedelta(seconds=lag_seconds)
+    first_recent = connection.execute(
+        select(func.min(changes.c.id)).where(changes.c.changed_at >= cutoff)
+    ).scalar()
+    return current if first_recent is None else min(current, first_recent - 1)
+
+
+def prune_catalog_changes(connection, retention_days=CATALOG_CHANGE_RETENTION_DAYS):
+    """Delete changes past the retention period, always keeping the latest so the current version survives"""
+    _, current = catalog_change_bounds(connection)
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    result = connection.execute(
+        delete(changes).where(changes.c.changed_at < cutoff, changes.c.id < current)
+    )
+    return result.rowcount
@@ -0,0 +1,218 @@
+import csv
+import io
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from models import db, Chapter, Quiz, Question
+from catalog_cache import bump_catalog_version, bump_quiz_versions, forget_quiz_versions
+from catalog_changes import log_catalog_changes
+
+# Only the first errors are returned; error_count has the total
+MAX_REPORTED_ERRORS = 1000
+OPTION_FIELDS = ('option1', 'option2', 'option3', 'option4')
+
+quiz_table = Quiz.__table__
+question_table = Question.__table__
+
+
+def parse_int(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def text_value(raw, field):
+    value = raw.get(field)
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def collect_csv(text):
+    """
+    Read CSV rows into (quiz specs, question specs).
+
+    A row with quiz_id adds a question to an existing quiz. Rows without
+    it are grouped by (chapter_id, quiz_name) into new quizzes, whose
+    date_of_quiz, time_duration and remarks are taken from their first row.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    quizzes, questions, quiz_refs = [], [], {}
+    for line, row in enumerate(reader, start=2):
+        location = {'row': line}
+        if text_value(row, 'quiz_id'):
+            questions.append((location, row, ('id', row['quiz_id'])))
+            continue
+        key = (text_value(row, 'chapter_id'), text_value(row, 'quiz_name'))
+        if key not in quiz_refs:
+            quiz_refs[key] = len(quizzes)
+            quizzes.append((location, dict(row, name=row.get('quiz_name'))))
+        questions.append((location, row, ('ref', quiz_refs[key])))
+    return quizzes, questions
+
+
+def collect_json(data):
+    """
+    Read a JSON body into (quiz specs, question specs).
+
+    {"questions": [...]} adds questions to existing quizzes by quiz_id;
+    {"quizzes": [{..., "questions": [...]}]} creates quizzes with their questions.
+    """
+    quizzes, questions = [], []
+    for i, raw in enumerate(data.get('questions') or [], start=1):
+        raw = raw if isinstance(raw, dict) else {}
+        questions.append(({'row': i}, raw, ('id', raw.get('quiz_id'))))
+    for i, raw in enumerate(data.get('quizzes') or [], start=1):
+        raw = raw if isinstance(raw, dict) else {}
+        ref = len(quizzes)
+        quizzes.append(({'quiz': i}, raw))
+        for j, question in enumerate(raw.get('questions') or [], start=1):
+            question = question if isinstance(question, dict) else {}
+            questions.append(({'quiz': i, 'question': j}, question, ('ref', ref)))
+    return quizzes, questions
+
+
+def clean_quiz(raw):
+    """(quiz row, error messages) for one quiz spec, checked the way create_quiz checks it"""
+    errors = []
+    name = text_value(raw, 'name')
+    chapter_id = parse_int(raw.get('chapter_id'))
+    if not name:
+        errors.append('name is required')
+    elif len(name) > 120:
+        errors.append('name is longer than 120 characters')
+    if chapter_id is None:
+        errors.append('chapter_id is required and must be an integer')
+
+    date_of_quiz = text_value(raw, 'date_of_quiz')
+    if date_of_quiz:
+        try:
+            date_of_quiz = datetime.strptime(date_of_quiz, '%Y-%m-%d')
+        except ValueError:
+            errors.append('date_of_quiz must be YYYY-MM-DD')
+
+    time_duration = text_value(raw, 'time_duration')
+    if time_duration:
+        minutes = parse_int(time_duration)
+        if minutes is None or not 0 < minutes < 24 * 60:
+            errors.append('time_duration must be a number of minutes under 24 hours')
+        else:
+            time_duration = (datetime.min + timedelta(minutes=minutes)).time()
+
+    return {
+        'name': name,
+        'chapter_id': chapter_id,
+        'date_of_quiz': date_of_quiz,
+        'time_duration': time_duration,
+        'remarks': text_value(raw, 'remarks'),
+        'created_at': datetime.utcnow()
+    }, errors
+
+
+def clean_question(raw):
+    """(question row without quiz_id, error messages) for one question spec"""
+    errors = []
+    statement = text_value(raw, 'question_statement')
+    if not statement:
+        errors.append('question_statement is required')
+
+    row = {'question_statement': statement}
+    for field in OPTION_FIELDS:
+        option = text_value(raw, field)
+        if not option:
+            errors.append(f'{field} is required')
+        elif len(option) > 200:
+            errors.append(f'{field} is longer than 200 characters')
+        row[field] = option
+
+    correct_option = parse_int(raw.get('correct_option'))
+    if correct_option not in (1, 2, 3, 4):
+        errors.append('correct_option must be 1, 2, 3 or 4')
+    row['correct_option'] = correct_option
+    return row, errors
+
+
+def existing_ids(column, ids):
+    ids = list(ids)
+    if not ids:
+        return set()
+    return set(db.session.execute(select(column).where(column.in_(ids))).scalars())
+
+
+def validate_import(quiz_specs, question_specs):
+    """
+    Check every quiz and question before anything is written.
+
+    Returns (quiz rows, question rows with their target, errors); each
+    error carries the location of its row in the upload.
+    """
+    errors = []
+    quizzes = []
+    for location, raw in quiz_specs:
+        quiz, messages = clean_quiz(raw)
+        quizzes.append(quiz)
+        errors.extend(dict(location, error=message) for message in messages)
+
+    chapter_ids = existing_ids(Chapter.id, {q['chapter_id'] for q in quizzes if q['chapter_id'] is not None})
+    for (location, _), quiz in zip(quiz_specs, quizzes):
+        if quiz['chapter_id'] is not None and quiz['chapter_id'] not in chapter_ids:
+            errors.append(dict(location, error=f"Chapter {quiz['chapter_id']} does not exist"))
+
+    quiz_ids = existing_ids(Quiz.id, {
+        parse_int(target) for _, _, (kind, target) in question_specs
+        if kind == 'id' and parse_int(target) is not None
+    })
+    questions = []
+    for location, raw, (kind, target) in question_specs:
+        question, messages = clean_question(raw)
+        if kind == 'id':
+            target = parse_int(target)
+            if target is None:
+                messages.append('quiz_id is required and must be an integer')
+            elif target not in quiz_ids:
+                messages.append(f'Quiz {target} does not exist')
+        questions.append((question, kind, target))
+        errors.extend(dict(location, error=message) for message in messages)
+
+    return quizzes, questions, errors
+
+
+def import_catalog(quizzes, questions):
+    """
+    Insert validated quizzes and questions in one transaction.
+
+    Questions go in with a single executemany INSERT ... RETURNING, which
+    gives exactly their new ids. The change log, quiz content versions and
+    catalog version are updated here, since Core inserts bypass the ORM
+    listeners that normally maintain them.
+    """
+    connection = db.session.connection()
+
+    quiz_ids = [
+        db.session.execute(insert(quiz_table).values(**quiz)).inserted_primary_key[0]
+        for quiz in quizzes
+    ]
+    rows = [
+        dict(question, quiz_id=quiz_ids[target] if kind == 'ref' else target)
+        for question, kind, target in questions
+    ]
+    question_ids = []
+    if rows:
+        question_ids = db.session.execute(
+            insert(question_table).returning(question_table.c.id), rows
+        ).scalars().all()
+
+    log_catalog_changes(connection, 'quiz', quiz_ids, 'created')
+    log_catalog_changes(connection, 'question', question_ids, 'created')
+    # New quizzes start at version 1; existing ones that gained questions move on
+    extended_quiz_ids = {row['quiz_id'] for row in rows} - set(quiz_ids)
+    bump_quiz_versions(connection, extended_quiz_ids)
+    db.session.commit()
+
+    bump_catalog_version()
+    forget_quiz_versions(extended_quiz_ids)
+    return quiz_ids, len(rows)
@@ -1,7 +1,9 @@
+import os
 from celery.schedules import crontab
+from redis_store import redis_url
 
-broker_url = "redis://localhost:6379/0"
-result_backend = "redis://localhost:6379/1"
+broker_url = redis_url(0)
+result_backend = redis_url(1)
 timezone = "Asia/Kolkata"
 enable_utc = False
 broker_connection_retry_on_startup = True
@@ -17,8 +19,11 @@ task_soft_time_limit = 25 * 60  # 25 minutes
 # Worker configuration
 worker_prefetch_multiplier = 1
 worker_max_tasks_per_child = 1000
-worker_pool = 'solo'  # For Windows
-worker_concurrency = 1  # Single worker process
+# 'solo' with one process suits Windows; on Linux use CELERY_WORKER_POOL=prefork
+# and raise CELERY_WORKER_CONCURRENCY (e.g. to the CPU count) so the monthly
+# report chunks run in parallel
+worker_pool = os.getenv('CELERY_WORKER_POOL', 'solo')
+worker_concurrency = int(os.getenv('CELERY_WORKER_CONCURRENCY', 1))
 
 # Beat schedule configuration
 beat_schedule = {
@@ -33,6 +38,26 @@ beat_schedule = {
         'args': (),  # No arguments - will auto-detect previous month
         'options': {'expires': 3600 * 24}  # 24 hours expiry
     },
+    'email-outbox-dispatch': {
+        'task': 'celery_tasks.dispatch_email_outbox',
+        'schedule': crontab(minute='*/5'),  # picks up retries and expired leases
+        'options': {'expires': 300}
+    },
+    'export-file-cleanup': {
+        'task': 'export_tasks.cleanup_export_files',
+        'schedule': crontab(minute=0),  # hourly
+        'options': {'expires': 3600}
+    },
+    'catalog-change-prune': {
+        'task': 'celery_tasks.prune_catalog_change_log',
+        'schedule': crontab(hour=3, minute=30),  # daily
+        'options': {'expires': 3600}
+    },
+    'email-outbox-prune': {
+        'task': 'celery_tasks.prune_email_outbox',
+        'schedule': crontab(hour=3, minute=45),  # daily
+        'options': {'expires': 3600}
+    },
 }
 
 # Beat configuration
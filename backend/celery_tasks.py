@@ -1,283 +1,23 @@
-from celery import shared_task
+from celery import shared_task, chord
 from models import db, User
 from datetime import datetime
 import uuid
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from flask import render_template_string
-from sqlalchemy import func, desc
-from datetime import timedelta
+from report_data import (
+    load_monthly_report_data, month_bounds, monthly_quiz_rankings, rankings_as_rows, rankings_from_rows
+)
+from mail_transport import send_email, smtp_pool
+from email_outbox import (
+    enqueue_emails, queued_dedupe_keys, dispatch_outbox, prune_outbox, OUTBOX_DISPATCHERS, OUTBOX_DISPATCH_SECONDS
+)
+from report_templates import generate_monthly_report_html
+from catalog_changes import prune_catalog_changes
 
 # Import export tasks to ensure they're registered
 import export_tasks
 
-# Email configuration
-SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
-SMTP_USERNAME = os.getenv('SMTP_USERNAME', 'projectaaron11@gmail.com')
-SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', 'xypc lhco tpoq bvza')
-
-def send_email(to_email, subject, html_content):
-    """Send HTML email"""
-    try:
-        print(f"Attempting to send email to: {to_email}")
-        print(f"Using SMTP: {SMTP_SERVER}:{SMTP_PORT}")
-        print(f"Username: {SMTP_USERNAME}")
-        
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = SMTP_USERNAME
-        msg['To'] = to_email
-
-        html_part = MIMEText(html_content, 'html')
-        msg.attach(html_part)
-
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            print("TLS started successfully")
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            print("Login successful")
-            server.send_message(msg)
-            print("Message sent successfully")
-        
-        return True
-    except smtplib.SMTPAuthenticationError as e:
-        print(f"SMTP Authentication failed: {str(e)}")
-        return False
-    except smtplib.SMTPException as e:
-        print(f"SMTP error: {str(e)}")
-        return False
-    except Exception as e:
-        print(f"Email sending failed: {str(e)}")
-        return False
-
-def generate_monthly_report_html(user_id, month_year):
-    """Generate HTML content for monthly report"""
-    
-    print(f"🔍 generate_monthly_report_html called for user_id: {user_id}, month_year: {month_year}")
-    
-    # Get user details
-    user = User.query.get(user_id)
-    if not user:
-        print(f"❌ User {user_id} not found")
-        return None
-    
-    print(f"✅ User found: {user.username}")
-    
-    # Parse month_year (format: "2024-01")
-    try:
-        report_date = datetime.strptime(month_year, "%Y-%m")
-        start_date = report_date.replace(day=1)
-        if report_date.month == 12:
-            end_date = report_date.replace(year=report_date.year + 1, month=1, day=1) - timedelta(days=1)
-        else:
-            end_date = report_date.replace(month=report_date.month + 1, day=1) - timedelta(days=1)
-    except:
-        return None
-    
-    # Get monthly quiz data
-    from models import Score, Quiz, Chapter, Subject
-    
-    monthly_scores = db.session.query(
-        Score.id,
-        Score.total_scored,
-        Score.total_questions,
-        Score.timestamp,
-        Quiz.name.label('quiz_name'),
-        Chapter.name.label('chapter_name'),
-        Subject.name.label('subject_name')
-    ).join(
-        Quiz, Score.quiz_id == Quiz.id
-    ).join(
-        Chapter, Quiz.chapter_id == Chapter.id
-    ).join(
-        Subject, Chapter.subject_id == Subject.id
-    ).filter(
-        Score.user_id == user_id,
-        Score.timestamp >= start_date,
-        Score.timestamp <= end_date
-    ).order_by(
-        Score.timestamp.desc()
-    ).all()
-    
-    # Calculate statistics
-    total_quizzes = len(monthly_scores)
-    total_questions = sum(score.total_questions or 0 for score in monthly_scores)
-    total_scored = sum(score.total_scored or 0 for score in monthly_scores)
-    average_score = round((total_scored / total_questions * 100), 2) if total_questions > 0 else 0
-    
-    print(f"📊 Found {total_quizzes} quizzes for user {user_id} in {month_year}")
-    print(f"📊 Date range: {start_date} to {end_date}")
-    print(f"📊 Total questions: {total_questions}, Total scored: {total_scored}")
-    
-    # Get subject-wise breakdown
-    subject_stats = {}
-    for score in monthly_scores:
-        subject = score.subject_name
-        if subject not in subject_stats:
-            subject_stats[subject] = {'quizzes': 0, 'total_scored': 0, 'total_questions': 0}
-        subject_stats[subject]['quizzes'] += 1
-        subject_stats[subject]['total_scored'] += score.total_scored or 0
-        subject_stats[subject]['total_questions'] += score.total_questions or 0
-    
-    # Calculate subject averages
-    for subject in subject_stats:
-        stats = subject_stats[subject]
-        stats['average'] = round((stats['total_scored'] / stats['total_questions'] * 100), 2) if stats['total_questions'] > 0 else 0
-    
-    # Get ranking data (position among all users for each quiz)
-    quiz_rankings = {}
-    for score in monthly_scores:
-        quiz_id = score.id
-        # Get all scores for this quiz and find user's rank
-        all_quiz_scores = db.session.query(
-            Score.user_id,
-            Score.total_scored,
-            Score.total_questions,
-            func.rank().over(order_by=desc(Score.total_scored)).label('rank')
-        ).filter(
-            Score.quiz_id == quiz_id
-        ).all()
-        
-        user_rank = next((s.rank for s in all_quiz_scores if s.user_id == user_id), None)
-        if user_rank:
-            quiz_rankings[quiz_id] = user_rank
-    
-    # Generate HTML
-    html_template = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Monthly Quiz Report - {{ month_year }}</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
-            .container { max-width: 800px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }
-            .header { text-align: center; border-bottom: 2px solid #007bff; padding-bottom: 20px; margin-bottom: 30px; }
-            .header h1 { color: #007bff; margin: 0; }
-            .user-info { background: #f8f9fa; padding: 15px; border-radius: 5px; margin-bottom: 20px; }
-            .stats-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px; }
-            .stat-card { background: #007bff; color: white; padding: 20px; border-radius: 8px; text-align: center; }
-            .stat-card h3 { margin: 0 0 10px 0; font-size: 2em; }
-            .stat-card p { margin: 0; opacity: 0.9; }
-            .section { margin-bottom: 30px; }
-            .section h2 { color: #333; border-bottom: 1px solid #ddd; padding-bottom: 10px; }
-            table { width: 100%; border-collapse: collapse; margin-top: 15px; }
-            th, td { padding: 12px; text-align: left; border-bottom: 1px solid #ddd; }
-            th { background-color: #f8f9fa; font-weight: bold; }
-            .score-good { color: #28a745; font-weight: bold; }
-            .score-average { color: #ffc107; font-weight: bold; }
-            .score-poor { color: #dc3545; font-weight: bold; }
-            .rank-badge { background: #007bff; color: white; padding: 4px 8px; border-radius: 12px; font-size: 0.8em; }
-            .subject-card { background: #f8f9fa; padding: 15px; border-radius: 5px; margin-bottom: 10px; }
-            .footer { text-align: center; margin-top: 30px; padding-top: 20px; border-top: 1px solid #ddd; color: #666; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>📊 Monthly Quiz Report</h1>
-                <p>{{ month_year }}</p>
-            </div>
-            
-            <div class="user-info">
-                <h3>👤 User Information</h3>
-                <p><strong>Name:</strong> {{ user.full_name or user.username }}</p>
-                <p><strong>Username:</strong> {{ user.username }}</p>
-                <p><strong>Qualification:</strong> {{ user.qualification or 'Not specified' }}</p>
-            </div>
-            
-            <div class="stats-grid">
-                <div class="stat-card">
-                    <h3>{{ total_quizzes }}</h3>
-                    <p>Quizzes Taken</p>
-                </div>
-                <div class="stat-card">
-                    <h3>{{ average_score }}%</h3>
-                    <p>Average Score</p>
-                </div>
-            </div>
-            
-            {% if subject_stats %}
-            <div class="section">
-                <h2>📚 Subject-wise Performance</h2>
-                {% for subject, stats in subject_stats.items() %}
-                <div class="subject-card">
-                    <h4>{{ subject }}</h4>
-                    <p><strong>Quizzes:</strong> {{ stats.quizzes }} | 
-                       <strong>Average:</strong> {{ stats.average }}% | 
-                       <strong>Score:</strong> {{ stats.total_scored }}/{{ stats.total_questions }}</p>
-                </div>
-                {% endfor %}
-            </div>
-            {% endif %}
-            
-            {% if monthly_scores %}
-            <div class="section">
-                <h2>📝 Quiz Details</h2>
-                <table>
-                    <thead>
-                        <tr>
-                            <th>Date</th>
-                            <th>Subject</th>
-                            <th>Chapter</th>
-                            <th>Quiz</th>
-                            <th>Score</th>
-                            <th>Percentage</th>
-                            <th>Rank</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {% for score in monthly_scores %}
-                        <tr>
-                            <td>{{ score.timestamp.strftime('%Y-%m-%d %H:%M') }}</td>
-                            <td>{{ score.subject_name }}</td>
-                            <td>{{ score.chapter_name }}</td>
-                            <td>{{ score.quiz_name }}</td>
-                            <td>{{ score.total_scored or 0 }}/{{ score.total_questions or 0 }}</td>
-                            <td class="{% if score.total_questions and score.total_questions > 0 and (score.total_scored or 0)/(score.total_questions)*100 >= 80 %}score-good{% elif score.total_questions and score.total_questions > 0 and (score.total_scored or 0)/(score.total_questions)*100 >= 60 %}score-average{% else %}score-poor{% endif %}">
-                                {% if score.total_questions and score.total_questions > 0 %}
-                                    {{ "%.1f"|format((score.total_scored or 0)/(score.total_questions)*100) }}%
-                                {% else %}
-                                    0.0%
-                                {% endif %}
-                            </td>
-                            <td>
-                                {% if score.id in quiz_rankings %}
-                                <span class="rank-badge">#{{ quiz_rankings[score.id] }}</span>
-                                {% else %}
-                                N/A
-                                {% endif %}
-                            </td>
-                        </tr>
-                        {% endfor %}
-                    </tbody>
-                </table>
-            </div>
-            {% endif %}
-            
-            <div class="footer">
-                <p>This report was generated automatically on {{ datetime.now().strftime('%Y-%m-%d %H:%M:%S') }}</p>
-                <p>Keep up the great work! 🚀</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return render_template_string(html_template, 
-                                user=user, 
-                                month_year=month_year,
-                                total_quizzes=total_quizzes,
-                                total_questions=total_questions,
-                                total_scored=total_scored,
-                                average_score=average_score,
-                                subject_stats=subject_stats,
-                                monthly_scores=monthly_scores,
-                                quiz_rankings=quiz_rankings,
-                                datetime=datetime)
+# Users per process_report_chunk task in the monthly fan-out
+REPORT_CHUNK_SIZE = int(os.getenv('REPORT_CHUNK_SIZE', 500))
 
 @shared_task(bind=True)
 def generate_user_report(self, user_id, month_year):
@@ -341,9 +81,148 @@ def send_report_email(self, user_id, month_year, html_content):
         print(f"Error sending email for user {user_id}: {str(e)}")
         raise
 
+def monthly_report_key(month_year, user_id):
+    return f"monthly-report:{month_year}:{user_id}"
+
+def daily_reminder_key(day, user_id):
+    return f"daily-reminder:{day.isoformat()}:{user_id}"
+
+def render_user_report(user, month_year, report_data):
+    """Render one user's monthly report, returning (result entry, html or None)"""
+    try:
+        html_content = generate_monthly_report_html(user.id, month_year, report_data)
+        
+        if not html_content:
+            print(f"❌ Failed to generate report for user {user.username}")
+            return {
+                'user_id': user.id,
+                'username': user.username,
+                'report_status': 'failed',
+                'email_status': 'not_attempted',
+                'success': False,
+                'error': 'No report content generated'
+            }, None
+        
+        print(f"✅ Successfully processed user {user.username}")
+        return {
+            'user_id': user.id,
+            'username': user.username,
+            'report_status': 'generated',
+            'email_status': 'queued',
+            'success': True
+        }, html_content
+    except Exception as e:
+        print(f"Error processing user {user.id}: {str(e)}")
+        return {
+            'user_id': user.id,
+            'username': user.username,
+            'report_status': 'error',
+            'email_status': 'not_attempted',
+            'success': False,
+            'error': str(e)
+        }, None
+
+@shared_task(bind=True)
+def process_report_chunk(self, user_ids, month_year, ranking_rows=None):
+    """
+    Generate the monthly reports for one batch of users and queue them in the email outbox.
+
+    ranking_rows are the batch's [user_id, quiz_id, rank] rows from the
+    run's single ranking query; without them the chunk ranks its users itself.
+    """
+    print(f"Processing report chunk of {len(user_ids)} users for {month_year}")
+    
+    # Load the users and the batch's scores up front, so the chunk
+    # costs the same few queries however many users it holds
+    users = User.query.filter(User.id.in_(user_ids)).order_by(User.id).all()
+    report_data = load_monthly_report_data(
+        month_year, user_ids=user_ids,
+        quiz_rankings=rankings_from_rows(ranking_rows) if ranking_rows is not None else None
+    )
+    
+    # Reports queued by an earlier (possibly crashed) run are not rendered or sent again
+    keys = {user.id: monthly_report_key(month_year, user.id) for user in users}
+    already_queued = queued_dedupe_keys(keys.values())
+    subject = f"Monthly Quiz Report - {month_year}"
+    
+    results = []
+    messages = []
+    for i, user in enumerate(users, 1):
+        self.update_state(
+            state='PROGRESS',
+            meta={
+                'current': i,
+                'total': len(users),
+                'status': f'Processing user {user.username} ({i}/{len(users)})'
+            }
+        )
+        if keys[user.id] in already_queued:
+            results.append({
+                'user_id': user.id,
+                'username': user.username,
+                'report_status': 'skipped',
+                'email_status': 'already_queued',
+                'success': True
+            })
+            continue
+        
+        result, html_content = render_user_report(user, month_year, report_data)
+        if html_content:
+            messages.append((keys[user.id], user.username, subject, html_content))
+        results.append(result)
+    
+    enqueue_emails(messages)
+    db.session.commit()
+    if messages:
+        dispatch_email_outbox.delay()
+    
+    # Users deleted after the run was planned
+    found = {user.id for user in users}
+    for user_id in user_ids:
+        if user_id not in found:
+            results.append({
+                'user_id': user_id,
+                'username': 'unknown',
+                'report_status': 'failed',
+                'email_status': 'not_attempted',
+                'success': False,
+                'error': 'User not found'
+            })
+    return results
+
+@shared_task(bind=True)
+def summarize_reports(self, chunk_results, month_year):
+    """Chord callback: combine every chunk's results into the run summary"""
+    results = [result for chunk in chunk_results for result in chunk]
+    total_users = len(results)
+    successful = sum(1 for r in results if r.get('success', False))
+    failed = total_users - successful
+    
+    print(f"Completed processing {total_users} users")
+    print(f"✅ Successful: {successful}")
+    print(f"❌ Failed: {failed}")
+    
+    return {
+        'message': f'Completed report generation for {total_users} users',
+        'summary': {
+            'total_users': total_users,
+            'successful': successful,
+            'failed': failed,
+            'success_rate': round((successful / total_users) * 100, 2) if total_users > 0 else 0
+        },
+        'results': results,
+        'month_year': month_year
+    }
+
 @shared_task(bind=True)
 def process_all_reports(self, month_year=None):
-    """Process reports for all users"""
+    """
+    Fan the monthly reports out across workers.
+
+    Users are split into REPORT_CHUNK_SIZE batches, each handled by a
+    process_report_chunk task; summarize_reports runs once they all finish.
+    Returns straight away with the chord's id, whose result is the summary.
+    """
     try:
         # If month_year is not provided (called from scheduler), use current month
         if month_year is None:
@@ -356,81 +235,27 @@ def process_all_reports(self, month_year=None):
         
         print(f"Starting report generation for all users for {month_year}")
         
-        # Get all users
-        users = User.query.all()
-        print(f"Found {len(users)} users")
-        
-        results = []
-        total_users = len(users)
-        
-        for i, user in enumerate(users, 1):
-            try:
-                print(f"Processing user {user.id} ({user.username}) - {i}/{total_users}")
-                
-                # Update task progress
-                self.update_state(
-                    state='PROGRESS',
-                    meta={
-                        'current': i,
-                        'total': total_users,
-                        'status': f'Processing user {user.username} ({i}/{total_users})'
-                    }
-                )
-                
-                # Generate report
-                report_result = generate_user_report(user.id, month_year)
-                
-                if isinstance(report_result, dict) and report_result.get('html_content'):
-                    # Send email
-                    email_result = send_report_email(user.id, month_year, report_result['html_content'])
-                    results.append({
-                        'user_id': user.id,
-                        'username': user.username,
-                        'report_status': 'generated',
-                        'email_status': email_result.get('status', 'unknown'),
-                        'success': True
-                    })
-                    print(f"✅ Successfully processed user {user.username}")
-                else:
-                    results.append({
-                        'user_id': user.id,
-                        'username': user.username,
-                        'report_status': 'failed',
-                        'email_status': 'not_attempted',
-                        'success': False,
-                        'error': 'No report content generated'
-                    })
-                    print(f"❌ Failed to generate report for user {user.username}")
-                    
-            except Exception as e:
-                print(f"Error processing user {user.id}: {str(e)}")
-                results.append({
-                    'user_id': user.id,
-                    'username': user.username if user else 'unknown',
-                    'report_status': 'error',
-                    'email_status': 'not_attempted',
-                    'success': False,
-                    'error': str(e)
-                })
-        
-        # Calculate summary
-        successful = sum(1 for r in results if r.get('success', False))
-        failed = len(results) - successful
-        
-        print(f"Completed processing {len(results)} users")
-        print(f"✅ Successful: {successful}")
-        print(f"❌ Failed: {failed}")
+        user_ids = [user_id for user_id, in db.session.query(User.id).order_by(User.id)]
+        print(f"Found {len(user_ids)} users")
+        
+        if not user_ids:
+            return summarize_reports([], month_year)
         
+        # Rank the month once for the whole run; each chunk gets its users' rows
+        rankings = monthly_quiz_rankings(*month_bounds(month_year))
+        
+        chunks = [user_ids[i:i + REPORT_CHUNK_SIZE] for i in range(0, len(user_ids), REPORT_CHUNK_SIZE)]
+        result = chord(
+            process_report_chunk.s(chunk, month_year, rankings_as_rows(rankings, chunk)) for chunk in chunks
+        )(summarize_reports.s(month_year))
+        
+        print(f"Dispatched {len(chunks)} report chunks, summary task {result.id}")
         return {
-            'message': f'Completed report generation for {len(users)} users',
-            'summary': {
-                'total_users': total_users,
-                'successful': successful,
-                'failed': failed,
-                'success_rate': round((successful / total_users) * 100, 2) if total_users > 0 else 0
-            },
-            'results': results,
-            'month_year': month_year
+            'message': f'Dispatched report generation for {len(user_ids)} users',
+            'month_year': month_year,
+            'total_users': len(user_ids),
+            'chunks': len(chunks),
+            'summary_task_id': result.id
         }
     except Exception as e:
         print(f"Error processing all reports: {str(e)}")
@@ -555,36 +380,26 @@ Good evening! {len(new_quizzes)} new quiz{'s' if len(new_quizzes) > 1 else ''} {
 Best regards,
 Quiz Master Team"""
         
-        # Send reminders
-        success_count = 0
-        failure_count = 0
-        
-        for user in users:
-            try:
-                email = user.username
-                subject = f"Daily Quiz Reminder - {len(new_quizzes)} New Quiz{'s' if len(new_quizzes) > 1 else ''} Available"
-                
-                email_sent = send_email(email, subject, reminder_message)
-                
-                if email_sent:
-                    success_count += 1
-                    print(f"✅ Reminder sent to {user.username}")
-                else:
-                    failure_count += 1
-                    print(f"❌ Failed to send reminder to {user.username}")
-                    
-            except Exception as e:
-                failure_count += 1
-                print(f"❌ Error sending reminder to {user.username}: {str(e)}")
-        
-        print(f"Daily reminders completed: {success_count} successful, {failure_count} failed")
+        # Queue the reminders in the outbox; the dispatchers send them. The
+        # per-day key means a rerun of this task never emails anyone twice
+        subject = f"Daily Quiz Reminder - {len(new_quizzes)} New Quiz{'s' if len(new_quizzes) > 1 else ''} Available"
+        keys = {user.id: daily_reminder_key(today, user.id) for user in users}
+        already_queued = queued_dedupe_keys(keys.values())
+        queued_count = enqueue_emails(
+            (keys[user.id], user.username, subject, reminder_message)
+            for user in users if keys[user.id] not in already_queued
+        )
+        db.session.commit()
+        start_outbox_dispatchers()
+        
+        print(f"Daily reminders queued: {queued_count} new, {len(already_queued)} already queued")
         
         return {
             'status': 'SUCCESS',
-            'message': f'Daily reminders sent to {len(users)} users',
+            'message': f'Daily reminders queued for {len(users)} users',
             'quizzes_count': len(new_quizzes),
-            'success_count': success_count,
-            'failure_count': failure_count,
+            'queued_count': queued_count,
+            'already_queued_count': len(already_queued),
             'total_users': len(users)
         }
         
@@ -594,5 +409,45 @@ Quiz Master Team"""
             'status': 'FAILURE',
             'error': str(e),
             'message': 'Daily reminders failed'
-        } 
-        
\ No newline at end of file
+        }
+
+@shared_task(bind=True)
+def dispatch_email_outbox(self):
+    """Send due emails from the outbox; run several at once to add throughput"""
+    def report_progress(totals):
+        self.update_state(
+            state='PROGRESS',
+            meta={
+                'current': totals['sent'] + totals['failed'],
+                'status': f"Sent {totals['sent']} emails in {totals['batches']} batches"
+            }
+        )
+    
+    totals = dispatch_outbox(time_budget=OUTBOX_DISPATCH_SECONDS, progress=report_progress)
+    if not totals['exhausted']:
+        # Out of time with work left: hand over to a fresh task before the time limit
+        dispatch_email_outbox.delay()
+    
+    print(f"Outbox dispatch: {totals}")
+    print(f"SMTP pool: {smtp_pool.stats()}")
+    return totals
+
+def start_outbox_dispatchers(count=OUTBOX_DISPATCHERS):
+    for _ in range(count):
+        dispatch_email_outbox.delay()
+
+@shared_task(bind=True)
+def prune_catalog_change_log(self):
+    """Delete catalog changes past their retention period"""
+    with db.engine.begin() as connection:
+        removed = prune_catalog_changes(connection)
+    print(f"Pruned {removed} catalog changes")
+    return {'removed': removed}
+
+@shared_task(bind=True)
+def prune_email_outbox(self):
+    """Delete sent and failed outbox emails past their retention period"""
+    with db.engine.begin() as connection:
+        removed = prune_outbox(connection)
+    print(f"Pruned {removed} outbox emails")
+    return {'removed': removed}
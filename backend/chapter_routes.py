@@ -2,9 +2,18 @@ from flask import Blueprint, request, jsonify
 from models import db
 from models import Chapter
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from pagination import wants_full_listing, keyset_page
+from catalog_cache import cached_catalog_response
 
 chapter_bp = Blueprint('chapter_bp', __name__)
 
+CHAPTER_LIST_COLUMNS = {
+    'id': Chapter.id,
+    'name': Chapter.name,
+    'description': Chapter.description,
+    'subject_id': Chapter.subject_id
+}
+
 @chapter_bp.route('/chapter', methods=['POST'])
 @jwt_required()
 def create_chapter():
@@ -71,7 +80,14 @@ def delete_chapter(chapter_id):
 
 
 @chapter_bp.route('/chapters', methods=['GET'])
+@cached_catalog_response
 def get_all_chapters():
+    if not wants_full_listing():
+        try:
+            return jsonify(keyset_page(CHAPTER_LIST_COLUMNS, Chapter.id)), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
     try:
         chapters = Chapter.query.all()
         result = [
@@ -101,6 +117,7 @@ def search_chapters():
         return jsonify({'error': 'Error searching chapters'}), 400
     
 @chapter_bp.route('/subjects/<int:subject_id>/chapters', methods=['GET'])
+@cached_catalog_response
 def get_chapters_for_subject(subject_id):
     try:
         chapters = Chapter.query.filter_by(subject_id=subject_id).all()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Standalone query-count budget check for the full quiz listing.
+
+Seeds a throwaway SQLite database with several quizzes and questions,
+counts the SQL statements behind iter_all_quizzes() and GET
+/quizzes?all=true, and exits with a non-zero status if either needs more
+than its budget. Catches N+1 queries creeping back into the listing.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+# Point the app at a scratch database before it is imported
+_db_dir = tempfile.mkdtemp(prefix='quiz_master_query_counts_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'check.db')}"
+
+from sqlalchemy import event
+from app import app
+from models import db, Subject, Chapter, Quiz, Question
+from quiz_routes import iter_all_quizzes
+
+QUERY_BUDGET = 2
+QUIZZES = 20
+QUESTIONS_PER_QUIZ = 5
+
+
+def seed():
+    subject = Subject(name='Budget subject')
+    db.session.add(subject)
+    db.session.flush()
+    chapters = [Chapter(name=f'Budget chapter {i}', subject_id=subject.id) for i in range(4)]
+    db.session.add_all(chapters)
+    db.session.flush()
+    for i in range(QUIZZES):
+        quiz = Quiz(name=f'Budget quiz {i}', chapter_id=chapters[i % len(chapters)].id)
+        db.session.add(quiz)
+        db.session.flush()
+        db.session.add_all([
+            Question(
+                quiz_id=quiz.id, question_statement=f'Question {j}',
+                option1='a', option2='b', option3='c', option4='d', correct_option=1
+            ) for j in range(QUESTIONS_PER_QUIZ)
+        ])
+    db.session.commit()
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+
+def check_query_counts():
+    """Print the statement count of each check and return the names of those over budget"""
+    failures = []
+
+    def run_listing():
+        quizzes = list(iter_all_quizzes())
+        assert len(quizzes) == QUIZZES
+
+    def run_endpoint():
+        response = app.test_client().get('/quizzes?all=true')
+        assert response.status_code == 200, response.status_code
+        assert len(response.get_json()) == QUIZZES
+
+    for name, check in (('iter_all_quizzes()', run_listing), ('GET /quizzes?all=true', run_endpoint)):
+        db.session.remove()
+        with QueryCounter(db.engine) as counter:
+            check()
+        over = len(counter.statements) > QUERY_BUDGET
+        print(f"[{'OVER' if over else 'ok'}] {name}: {len(counter.statements)} queries (budget {QUERY_BUDGET})")
+        for statement in counter.statements:
+            print(f"    {' '.join(statement.split())[:120]}")
+        if over:
+            failures.append(name)
+    return failures
+
+
+if __name__ == '__main__':
+    try:
+        with app.app_context():
+            db.create_all()
+            seed()
+            failures = check_query_counts()
+    finally:
+        shutil.rmtree(_db_dir, ignore_errors=True)
+    if failures:
+        print(f"Query budget exceeded by: {', '.join(failures)}")
+        sys.exit(1)
+    print(f"The quiz listing stays within {QUERY_BUDGET} queries for {QUIZZES} quizzes.")
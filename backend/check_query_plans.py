@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Standalone query plan check for the hot filter/sort queries.
+
+Runs EXPLAIN QUERY PLAN for every query below and exits with a non-zero
+status if SQLite falls back to a full table SCAN for any of them.
+Run it after migrate_db.py or after adding a new model index.
+"""
+import re
+import sys
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import desc
+from models import db, Score, Quiz, Chapter, Subject, User, Question
+from config import Config
+
+app = Flask(__name__)
+app.config.from_object(Config)
+db.init_app(app)
+
+# A plan line such as "SCAN score" is a full table scan; "SCAN score USING
+# INDEX ..." walks an index in order and "SEARCH ..." is an index lookup.
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?! USING)')
+
+
+def hot_queries():
+    """Return (name, query) pairs for every query that must use an index"""
+    now = datetime.utcnow()
+    month_ago = now - timedelta(days=30)
+
+    export_query = db.session.query(
+        Score.id, Score.total_scored, Score.timestamp,
+        Quiz.name, Chapter.name, Subject.name, User.username
+    ).join(
+        Quiz, Score.quiz_id == Quiz.id
+    ).join(
+        Chapter, Quiz.chapter_id == Chapter.id
+    ).join(
+        Subject, Chapter.subject_id == Subject.id
+    ).join(
+        User, Score.user_id == User.id
+    )
+
+    return [
+        ('scores by user', Score.query.filter_by(user_id=1)),
+        ('scores by quiz', Score.query.filter_by(quiz_id=1)),
+        ('quiz ranking', db.session.query(Score.user_id, Score.total_scored).filter(
+            Score.quiz_id == 1
+        ).order_by(desc(Score.total_scored))),
+        ('monthly report scores', export_query.filter(
+            Score.user_id == 1,
+            Score.timestamp >= month_ago,
+            Score.timestamp <= now
+        ).order_by(Score.timestamp.desc())),
+        ('user export', export_query.filter(
+            Score.user_id == 1
+        ).order_by(Score.timestamp.desc())),
+        ('admin export by date', export_query.filter(
+            Score.timestamp >= month_ago,
+            Score.timestamp <= now
+        ).order_by(Score.timestamp.desc())),
+        ('quizzes by chapter', Quiz.query.filter_by(chapter_id=1)),
+        ('chapters by subject', Chapter.query.filter_by(subject_id=1)),
+        ('questions by quiz', Question.query.filter_by(quiz_id=1)),
+        ('quizzes created today', Quiz.query.filter(
+            Quiz.created_at >= now.replace(hour=0, minute=0, second=0),
+            Quiz.created_at <= now
+        )),
+    ]
+
+
+def explain(query):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    compiled = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+    return [row[-1] for row in rows]
+
+
+def check_query_plans():
+    """Print each plan and return the names of queries that regressed to a SCAN"""
+    failures = []
+    for name, query in hot_queries():
+        plan = explain(query)
+        scans = [line for line in plan if FULL_SCAN.match(line)]
+        status = 'SCAN' if scans else 'ok'
+        print(f"[{status}] {name}")
+        for line in plan:
+            print(f"    {line}")
+        if scans:
+            failures.append(name)
+    return failures
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        db.create_all()
+        failures = check_query_plans()
+        if failures:
+            print(f"Full table scans found in: {', '.join(failures)}")
+            sys.exit(1)
+        print("All hot queries use an index.")
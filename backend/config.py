@@ -3,9 +3,36 @@ from datetime import timedelta
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
+DATABASE_URL = os.getenv('DATABASE_URL', f"sqlite:///{os.path.join(BASE_DIR, 'database.db')}")
+
+def engine_options(database_url):
+    """Connection pool settings for client/server databases (SQLite keeps the defaults)"""
+    if database_url.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),  # seconds
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),  # seconds
+        'pool_pre_ping': True,
+    }
+
 class Config:
     SECRET_KEY = "your_secret_key_here"
-    SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(BASE_DIR, 'database.db')}"
+    SQLALCHEMY_DATABASE_URI = DATABASE_URL
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(DATABASE_URL)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_VERIFY_SUB = False
-    CORS_HEADERS = "Content-Type"
\ No newline at end of file
+    CORS_HEADERS = "Content-Type"
+
+    # SQLite connection tuning, applied to every new connection by the
+    # connect listener in models.py. Set a value to an empty string to skip it.
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': os.getenv('SQLITE_BUSY_TIMEOUT', '5000'),  # milliseconds
+        'mmap_size': os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),  # bytes
+        'cache_size': os.getenv('SQLITE_CACHE_SIZE', '-65536'),  # negative = KiB
+        'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+        'foreign_keys': os.getenv('SQLITE_FOREIGN_KEYS', 'ON'),
+    }
\ No newline at end of file
@@ -0,0 +1,218 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, insert, delete, func, or_, and_
+from models import db, EmailOutbox
+from bulk_mail import send_bulk_email
+
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 100))
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', 300))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('OUTBOX_RETRY_BASE_SECONDS', 60))
+# Dispatcher tasks started after a bulk enqueue
+OUTBOX_DISPATCHERS = int(os.getenv('OUTBOX_DISPATCHERS', 2))
+# A dispatcher task hands over to a new one, queued behind other tasks, after
+# this long; kept short so a large outbox never holds a worker for long
+OUTBOX_DISPATCH_SECONDS = int(os.getenv('OUTBOX_DISPATCH_SECONDS', 60))
+# Sent and failed rows are kept this long so their dedupe_key still stops a
+# rerun from queueing them again; monthly report keys cover a whole month
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', 62))
+
+outbox = EmailOutbox.__table__
+
+
+def insert_ignoring_duplicates():
+    """INSERT that skips rows whose dedupe_key is already in the outbox"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(outbox).prefix_with('IGNORE')
+    return dialect_insert(outbox).on_conflict_do_nothing(index_elements=['dedupe_key'])
+
+
+def queued_dedupe_keys(keys):
+    """The subset of keys that already have an outbox row (queued, sent or failed)"""
+    keys = list(keys)
+    if not keys:
+        return set()
+    return set(db.session.execute(
+        select(outbox.c.dedupe_key).where(outbox.c.dedupe_key.in_(keys))
+    ).scalars())
+
+
+def enqueue_emails(messages):
+    """
+    Bulk insert (dedupe_key, to_email, subject, html_content) messages.
+
+    Messages whose dedupe_key is already in the outbox are skipped, so a
+    rerun of a producer never queues the same email twice. The caller
+    commits, which lets the enqueue share a transaction with its own writes.
+    Returns the number of messages submitted.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            'dedupe_key': dedupe_key,
+            'to_email': to_email,
+            'subject': subject,
+            'html_content': html_content,
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now
+        }
+        for dedupe_key, to_email, subject, html_content in messages
+    ]
+    if rows:
+        db.session.execute(insert_ignoring_duplicates(), rows)
+    return len(rows)
+
+
+def claimable(now):
+    """Due pending rows, plus rows whose dispatcher's lease ran out (it crashed or stalled)"""
+    return or_(
+        and_(outbox.c.status == 'pending', outbox.c.next_attempt_at <= now),
+        and_(outbox.c.status == 'sending', outbox.c.lease_until < now)
+    )
+
+
+def claim_batch(owner, batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Lease up to batch_size due rows to `owner` and return them, or None if nothing is due.
+
+    The UPDATE re-checks claimable(), so when two dispatchers pick the same
+    ids only the first one to write gets them; the other gets an empty list
+    and tries the next batch.
+    """
+    now = datetime.utcnow()
+    due = select(outbox.c.id).where(claimable(now)).order_by(outbox.c.id).limit(batch_size)
+    if db.engine.dialect.name == 'postgresql':
+        due = due.with_for_update(skip_locked=True)
+
+    ids = db.session.execute(due).scalars().all()
+    if ids:
+        db.session.execute(
+            update(outbox).where(outbox.c.id.in_(ids), claimable(now)).values(
+                status='sending',
+                lease_owner=owner,
+                lease_until=now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+            )
+        )
+    db.session.commit()
+    if not ids:
+        return None
+
+    return db.session.execute(
+        select(
+            outbox.c.id, outbox.c.to_email, outbox.c.subject,
+            outbox.c.html_content, outbox.c.attempts
+        ).where(
+            outbox.c.lease_owner == owner, outbox.c.status == 'sending'
+        ).order_by(outbox.c.id)
+    ).all()
+
+
+def complete_batch(owner, rows, failures):
+    """Mark a claimed batch sent, or schedule failed rows for a retry with exponential backoff"""
+    now = datetime.utcnow()
+    errors = {failure['index']: failure['error'] for failure in failures}
+    outcome = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    sent_ids = [row.id for i, row in enumerate(rows) if i not in errors]
+    if sent_ids:
+        db.session.execute(
+            update(outbox).where(outbox.c.id.in_(sent_ids), outbox.c.lease_owner == owner).values(
+                status='sent',
+                sent_at=now,
+                attempts=outbox.c.attempts + 1,
+                lease_owner=None,
+                lease_until=None,
+                last_error=None
+            )
+        )
+        outcome['sent'] = len(sent_ids)
+
+    for i, error in errors.items():
+        row = rows[i]
+        attempts = row.attempts + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            values = {'status': 'failed'}
+            outcome['failed'] += 1
+        else:
+            delay = OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            values = {'status': 'pending', 'next_attempt_at': now + timedelta(seconds=delay)}
+            outcome['retried'] += 1
+        db.session.execute(
+            update(outbox).where(outbox.c.id == row.id, outbox.c.lease_owner == owner).values(
+                attempts=attempts,
+                last_error=error[:1000],
+                lease_owner=None,
+                lease_until=None,
+                **values
+            )
+        )
+
+    db.session.commit()
+    return outcome
+
+
+def dispatch_outbox(batch_size=OUTBOX_BATCH_SIZE, time_budget=None, progress=None):
+    """
+    Claim, send and complete batches until nothing is due or time_budget seconds pass.
+
+    Returns the totals plus 'exhausted', which is False when the time budget
+    ran out with work possibly left over.
+    """
+    started = datetime.utcnow()
+    totals = {'batches': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'exhausted': True}
+    while True:
+        if time_budget is not None and (datetime.utcnow() - started).total_seconds() >= time_budget:
+            totals['exhausted'] = False
+            break
+
+        owner = uuid.uuid4().hex
+        rows = claim_batch(owner, batch_size)
+        if rows is None:
+            break
+        if not rows:
+            continue
+
+        delivery = send_bulk_email((row.to_email, row.subject, row.html_content) for row in rows)
+        outcome = complete_batch(owner, rows, delivery['failures'])
+
+        totals['batches'] += 1
+        for key, count in outcome.items():
+            totals[key] += count
+        if progress:
+            progress(totals)
+    return totals
+
+
+def outbox_depth():
+    """Row counts per status, plus what is due now and the age of the oldest pending email"""
+    now = datetime.utcnow()
+    depth = {status: 0 for status in ('pending', 'sending', 'sent', 'failed')}
+    depth.update(db.session.execute(
+        select(outbox.c.status, func.count()).group_by(outbox.c.status)
+    ).all())
+
+    depth['due'] = db.session.execute(
+        select(func.count()).select_from(outbox).where(claimable(now))
+    ).scalar()
+    oldest = db.session.execute(
+        select(func.min(outbox.c.created_at)).where(outbox.c.status.in_(('pending', 'sending')))
+    ).scalar()
+    depth['oldest_pending_at'] = oldest.isoformat() if oldest else None
+    return depth
+
+
+def prune_outbox(connection, retention_days=OUTBOX_RETENTION_DAYS):
+    """Delete sent and failed emails older than the retention period; pending and leased rows are kept"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    result = connection.execute(
+        delete(outbox).where(outbox.c.status.in_(('sent', 'failed')), outbox.c.created_at < cutoff)
+    )
+    return result.rowcount
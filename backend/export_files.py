@@ -0,0 +1,151 @@
+import glob
+import gzip
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports'))
+EXPORT_TTL_SECONDS = int(os.getenv('EXPORT_TTL_SECONDS', 24 * 3600))
+
+EXPORT_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Export formats accepted by the export endpoints; the .gz variants are
+# compressed while the rows are streamed, never in a separate pass
+EXPORT_FORMATS = {
+    'csv': {'suffix': '.csv', 'mimetype': 'text/csv', 'compressed': False},
+    'csv.gz': {'suffix': '.csv.gz', 'mimetype': 'application/gzip', 'compressed': True},
+    'ndjson': {'suffix': '.ndjson', 'mimetype': 'application/x-ndjson', 'compressed': False},
+    'ndjson.gz': {'suffix': '.ndjson.gz', 'mimetype': 'application/gzip', 'compressed': True},
+}
+EXPORT_COMPRESS_LEVEL = int(os.getenv('EXPORT_COMPRESS_LEVEL', 6))
+
+
+def new_export_id():
+    return uuid.uuid4().hex
+
+
+def export_path(export_id, suffix='.csv'):
+    return os.path.join(EXPORT_DIR, export_id + suffix)
+
+
+def meta_path(export_id):
+    return export_path(export_id, '.json')
+
+
+def open_export_file(export_id, export_format='csv'):
+    """
+    Open a temporary text file for an export being written.
+
+    Compressed formats go through a gzip stream, so each row is compressed as
+    it is written. Writers fill the file and then call publish_export, which
+    renames it into place, so a download never sees a half-written file.
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    spec = EXPORT_FORMATS[export_format]
+    path = export_path(export_id, spec['suffix'] + '.part')
+    if spec['compressed']:
+        return gzip.open(path, 'wt', compresslevel=EXPORT_COMPRESS_LEVEL, newline='', encoding='utf-8')
+    return open(path, 'w', newline='', encoding='utf-8')
+
+
+def publish_export(export_id, owner_id, filename, rows, export_format='csv', manifest=None):
+    """Move a finished export into place and record who may download it and until when"""
+    spec = EXPORT_FORMATS[export_format]
+    path = export_path(export_id, spec['suffix'])
+    os.replace(path + '.part', path)
+
+    created_at = datetime.now()
+    meta = {
+        'export_id': export_id,
+        'owner_id': owner_id,
+        'filename': filename,
+        'format': export_format,
+        'suffix': spec['suffix'],
+        'mimetype': spec['mimetype'],
+        'rows': rows,
+        'size': os.path.getsize(path),
+        'created_at': created_at.isoformat(),
+        'expires_at': (created_at + timedelta(seconds=EXPORT_TTL_SECONDS)).isoformat(),
+        'manifest': manifest
+    }
+    with open(meta_path(export_id), 'w') as f:
+        json.dump(meta, f, default=str)
+    return meta
+
+
+def load_export(export_id):
+    """Metadata of a downloadable export, or None if it does not exist or has expired"""
+    if not EXPORT_ID_PATTERN.match(export_id):
+        return None
+    try:
+        with open(meta_path(export_id)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if datetime.fromisoformat(meta['expires_at']) <= datetime.now():
+        return None
+    if not os.path.exists(export_path(export_id, meta['suffix'])):
+        return None
+    return meta
+
+
+def remove_export(export_id, suffix):
+    for path in (export_path(export_id, suffix), meta_path(export_id)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def remove_export_files(export_id):
+    """Remove every file of an export whose format is unknown, except a .part still being written"""
+    for path in glob.glob(os.path.join(glob.escape(EXPORT_DIR), glob.escape(export_id) + '.*')):
+        if not path.endswith('.part'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def cleanup_expired_exports():
+    """Delete expired exports and abandoned partial files; returns the number of files removed"""
+    if not os.path.isdir(EXPORT_DIR):
+        return 0
+
+    now = datetime.now()
+    stale_before = time.time() - EXPORT_TTL_SECONDS
+    removed = 0
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        if name.endswith('.json'):
+            try:
+                with open(path) as f:
+                    meta = json.load(f)
+                expired = datetime.fromisoformat(meta['expires_at']) <= now
+            except (OSError, ValueError, KeyError):
+                meta, expired = None, os.path.getmtime(path) < stale_before
+            if expired:
+                export_id = name[:-len('.json')]
+                if meta:
+                    remove_export(export_id, meta['suffix'])
+                else:
+                    remove_export_files(export_id)
+                removed += 1
+        elif name.endswith('.part'):
+            if os.path.getmtime(path) < stale_before:
+                # Left behind by a worker that died mid-export
+                os.remove(path)
+                removed += 1
+        elif not os.path.exists(meta_path(name.split('.', 1)[0])):
+            # A data file whose meta file is missing can never be downloaded;
+            # it may also be gone already, removed with its meta file above
+            try:
+                if os.path.getmtime(path) < stale_before:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+from sqlalchemy import func
+from models import db, Score
+from redis_store import cache_store
+from catalog_cache import get_catalog_version
+from export_files import EXPORT_TTL_SECONDS, load_export
+
+# How long a finished export answers identical requests
+EXPORT_REUSE_SECONDS = min(int(os.getenv('EXPORT_REUSE_SECONDS', 15 * 60)), EXPORT_TTL_SECONDS)
+# Matches task_time_limit: a run holding the key longer than that has been killed
+EXPORT_INFLIGHT_SECONDS = 30 * 60
+
+
+def artifact_key(fingerprint):
+    return f"export_artifact:{fingerprint}"
+
+
+def inflight_key(fingerprint):
+    return f"export_inflight:{fingerprint}"
+
+
+def score_data_version():
+    """
+    Changes whenever an exported score row could have changed.
+
+    Inserts raise max(id), updates raise max(updated_at) and deletes lower
+    the count; all three come from the score indexes.
+    """
+    count, max_id, last_change = db.session.query(
+        func.count(Score.id), func.max(Score.id), func.max(Score.updated_at)
+    ).one()
+    return [count, max_id, last_change.isoformat() if last_change else None]
+
+
+def export_fingerprint(scope, filters, export_format):
+    """
+    Hash of what an export would contain: its scope, normalized filters,
+    format and the current data version. None when Redis is unavailable,
+    since quiz/chapter/subject renames are then untracked.
+    """
+    catalog_version = get_catalog_version()
+    if catalog_version is None:
+        return None
+    key = json.dumps({
+        'scope': scope,
+        'filters': filters or {},
+        'format': export_format,
+        'scores': score_data_version(),
+        'catalog': catalog_version
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def find_reusable_export(fingerprint):
+    """The task result of a finished export with this fingerprint whose file is still there, or None"""
+    cached = cache_store.lookup(lambda r: r.get(artifact_key(fingerprint)))
+    if not cached:
+        return None
+    result = json.loads(cached)
+    if not load_export(result['export_id']):
+        return None
+    return result
+
+
+def claim_export_run(fingerprint, task_id):
+    """
+    Register task_id as the run producing this fingerprint.
+
+    Returns None if the claim succeeded (the caller starts the task), or the
+    id of the task already producing it. If Redis is unavailable the claim
+    succeeds, so exports run uncollapsed rather than not at all.
+    """
+    claimed = cache_store.execute(
+        lambda r: r.set(inflight_key(fingerprint), task_id, nx=True, ex=EXPORT_INFLIGHT_SECONDS),
+        default=True
+    )
+    if claimed:
+        return None
+    running = cache_store.execute(lambda r: r.get(inflight_key(fingerprint)))
+    # The run finished between the SET and the GET: claim again
+    if running is None:
+        return claim_export_run(fingerprint, task_id)
+    return running
+
+
+def record_export_artifact(fingerprint, result):
+    cache_store.execute(
+        lambda r: r.setex(artifact_key(fingerprint), EXPORT_REUSE_SECONDS, json.dumps(result))
+    )
+
+
+def release_export_run(fingerprint):
+    cache_store.execute(lambda r: r.delete(inflight_key(fingerprint)))
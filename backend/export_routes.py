@@ -1,110 +1,13 @@
 from flask import Blueprint, request, jsonify, send_file
 from models import db, Score, Quiz, Chapter, Subject, User
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func
 from datetime import datetime
-import csv
-import io
-import os
+from export_files import EXPORT_FORMATS, load_export, export_path
+from export_reuse import export_fingerprint, find_reusable_export, claim_export_run, release_export_run
+import uuid
 
 export_bp = Blueprint('export_bp', __name__)
 
-def generate_quiz_csv_data(user_id, start_date=None, end_date=None):
-    """
-    Generate CSV data for user's quiz details
-    """
-    # Base query to get quiz details
-    query = db.session.query(
-        Score.id.label('score_id'),
-        Score.quiz_id,
-        Score.user_id,
-        Score.total_scored,
-        Score.total_questions,
-        Score.timestamp,
-        Quiz.name.label('quiz_name'),
-        Quiz.date_of_quiz,
-        Quiz.time_duration,
-        Quiz.remarks,
-        Chapter.id.label('chapter_id'),
-        Chapter.name.label('chapter_name'),
-        Subject.id.label('subject_id'),
-        Subject.name.label('subject_name'),
-        User.username,
-        User.full_name
-    ).join(
-        Quiz, Score.quiz_id == Quiz.id
-    ).join(
-        Chapter, Quiz.chapter_id == Chapter.id
-    ).join(
-        Subject, Chapter.subject_id == Subject.id
-    ).join(
-        User, Score.user_id == User.id
-    ).filter(
-        Score.user_id == user_id
-    )
-    
-    # Add date filters if provided
-    if start_date:
-        query = query.filter(Score.timestamp >= start_date)
-    if end_date:
-        query = query.filter(Score.timestamp <= end_date)
-    
-    # Order by timestamp descending (most recent first)
-    query = query.order_by(Score.timestamp.desc())
-    
-    results = query.all()
-    
-    # Create CSV data
-    csv_data = io.StringIO()
-    csv_writer = csv.writer(csv_data)
-    
-    # Write header
-    csv_writer.writerow([
-        'Score ID',
-        'Quiz ID',
-        'User ID',
-        'Username',
-        'Full Name',
-        'Subject ID',
-        'Subject Name',
-        'Chapter ID',
-        'Chapter Name',
-        'Quiz Name',
-        'Total Scored',
-        'Total Questions',
-        'Percentage Score',
-        'Quiz Date',
-        'Quiz Duration',
-        'Quiz Remarks',
-        'Attempt Timestamp'
-    ])
-    
-    # Write data rows
-    for row in results:
-        percentage = round((row.total_scored / row.total_questions * 100), 2) if row.total_questions > 0 else 0
-        
-        csv_writer.writerow([
-            row.score_id,
-            row.quiz_id,
-            row.user_id,
-            row.username,
-            row.full_name or '',
-            row.subject_id,
-            row.subject_name,
-            row.chapter_id,
-            row.chapter_name,
-            row.quiz_name,
-            row.total_scored,
-            row.total_questions,
-            f"{percentage}%",
-            row.date_of_quiz.strftime('%Y-%m-%d') if row.date_of_quiz else '',
-            str(row.time_duration) if row.time_duration else '',
-            row.remarks or '',
-            row.timestamp.strftime('%Y-%m-%d %H:%M:%S') if row.timestamp else ''
-        ])
-    
-    return csv_data.getvalue()
-
 @export_bp.route('/export/user/<int:user_id>/quiz-details', methods=['POST'])
 @jwt_required()
 def export_user_quiz_details(user_id):
@@ -123,6 +26,10 @@ def export_user_quiz_details(user_id):
         # Get query parameters for date filtering
         start_date_str = data.get('start_date')  # Format: YYYY-MM-DD
         end_date_str = data.get('end_date')      # Format: YYYY-MM-DD
+        export_format = data.get('format', 'csv')
+        
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
         
         filters = {}
         
@@ -141,13 +48,14 @@ def export_user_quiz_details(user_id):
         
         # Submit Celery task
         from export_tasks import export_user_quiz_data
-        task = export_user_quiz_data.delay(user_id, filters)
+        task = export_user_quiz_data.delay(user_id, filters, export_format)
         
         return jsonify({
             'message': 'Export job submitted successfully',
             'task_id': task.id,
             'status': 'PENDING',
             'user_id': user_id,
+            'format': export_format,
             'filters': filters
         }), 202
         
@@ -174,6 +82,24 @@ def export_all_quiz_details():
         end_date_str = data.get('end_date')
         subject_id = data.get('subject_id')
         user_id = data.get('user_id')
+        export_format = data.get('format', 'csv')
+        mode = data.get('mode', 'full')
+        since = data.get('since')  # Delta watermark: {"updated_at": ISO timestamp, "score_id": id}
+        
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        
+        if mode not in ('full', 'delta'):
+            return jsonify({'error': "Invalid mode. Use 'full' or 'delta'"}), 400
+        
+        if since is not None:
+            if mode != 'delta':
+                return jsonify({'error': "since is only valid with mode 'delta'"}), 400
+            try:
+                datetime.fromisoformat(since['updated_at'])
+                since = {'updated_at': since['updated_at'], 'score_id': int(since['score_id'])}
+            except (TypeError, KeyError, ValueError):
+                return jsonify({'error': 'Invalid since. Use the watermark from a previous delta manifest'}), 400
         
         filters = {}
         
@@ -196,14 +122,64 @@ def export_all_quiz_details():
         if user_id:
             filters['user_id'] = int(user_id)
         
-        # Submit Celery task
         from export_tasks import export_admin_quiz_data
-        task = export_admin_quiz_data.delay(current_user.get('id'), filters)
+        
+        if mode == 'delta':
+            task = export_admin_quiz_data.delay(current_user.get('id'), filters, export_format, mode, since)
+            return jsonify({
+                'message': 'Export job submitted successfully',
+                'task_id': task.id,
+                'status': 'PENDING',
+                'format': export_format,
+                'mode': mode,
+                'filters': filters
+            }), 202
+        
+        # Identical filters over unchanged data: hand back the finished
+        # export, or the task already producing it, instead of a new run
+        fingerprint = export_fingerprint('admin', filters, export_format)
+        if fingerprint:
+            result = find_reusable_export(fingerprint)
+            if result:
+                return jsonify({
+                    'message': 'Reusing an identical export',
+                    'task_id': result['task_id'],
+                    'status': 'SUCCESS',
+                    'format': export_format,
+                    'mode': mode,
+                    'filters': filters,
+                    'result': result,
+                    'download_url': result['download_url']
+                }), 200
+            
+            task_id = uuid.uuid4().hex
+            running_task_id = claim_export_run(fingerprint, task_id)
+            if running_task_id:
+                return jsonify({
+                    'message': 'An identical export is already running',
+                    'task_id': running_task_id,
+                    'status': 'PENDING',
+                    'format': export_format,
+                    'mode': mode,
+                    'filters': filters
+                }), 202
+            try:
+                task = export_admin_quiz_data.apply_async(
+                    (current_user.get('id'), filters, export_format, mode, None, fingerprint),
+                    task_id=task_id
+                )
+            except Exception:
+                release_export_run(fingerprint)
+                raise
+        else:
+            task = export_admin_quiz_data.delay(current_user.get('id'), filters, export_format, mode)
         
         return jsonify({
             'message': 'Export job submitted successfully',
             'task_id': task.id,
             'status': 'PENDING',
+            'format': export_format,
+            'mode': mode,
             'filters': filters
         }), 202
         
@@ -236,12 +212,13 @@ def get_task_status(task_id):
                 'total': task.info.get('total', 1)
             }
         elif task.state == 'SUCCESS':
+            # The result only points at the export file; fetch it from download_url
             response = {
                 'task_id': task_id,
                 'state': task.state,
                 'result': task.result,
-                'csv_content': task.result.get('csv_content') if task.result else None,
-                'filename': task.result.get('filename') if task.result else None
+                'filename': task.result.get('filename') if task.result else None,
+                'download_url': task.result.get('download_url') if task.result else None
             }
         else:
             response = {
@@ -255,4 +232,43 @@ def get_task_status(task_id):
     except Exception as e:
         return jsonify({'error': f'Error getting task status: {str(e)}'}), 400
 
- 
\ No newline at end of file
+@export_bp.route('/export/download/<export_id>', methods=['GET'])
+@jwt_required()
+def download_export(export_id):
+    """
+    Download a finished export file (supports Range requests for resuming)
+    """
+    current_user = get_jwt_identity()
+    
+    meta = load_export(export_id)
+    if not meta:
+        return jsonify({'error': 'Export not found or expired'}), 404
+    
+    # Check if current user is admin or the user the export was made for
+    if current_user.get('role') != 'admin' and current_user.get('id') != meta['owner_id']:
+        return jsonify({"message": "Access forbidden"}), 403
+    
+    return send_file(
+        export_path(export_id, meta['suffix']),
+        mimetype=meta['mimetype'],
+        as_attachment=True,
+        download_name=meta['filename'],
+        conditional=True
+    )
+
+@export_bp.route('/export/manifest/<export_id>', methods=['GET'])
+@jwt_required()
+def get_export_manifest(export_id):
+    """
+    Get the manifest of a delta export, including the watermark to resume from
+    """
+    current_user = get_jwt_identity()
+    
+    meta = load_export(export_id)
+    if not meta or not meta.get('manifest'):
+        return jsonify({'error': 'Manifest not found or expired'}), 404
+    
+    if current_user.get('role') != 'admin' and current_user.get('id') != meta['owner_id']:
+        return jsonify({"message": "Access forbidden"}), 403
+    
+    return jsonify(dict(meta['manifest'], export_id=export_id, download_url=f"/export/download/{export_id}")), 200
@@ -1,32 +1,27 @@
 from celery import shared_task
-from models import db, Score, Quiz, Chapter, Subject, User
-from sqlalchemy import func, desc
-from datetime import datetime
+from models import db, Score, Quiz, Chapter, Subject, User, ExportWatermark
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from export_files import EXPORT_FORMATS, new_export_id, open_export_file, publish_export, cleanup_expired_exports
+from export_reuse import record_export_artifact, release_export_run
+from streaming import STREAM_BATCH_SIZE
 import csv
-import io
+import json
 import os
 
+EXPORT_BATCH_SIZE = STREAM_BATCH_SIZE
+# Delta exports stop this far behind the clock so a score written by a
+# transaction that commits late is still picked up by the next delta
+EXPORT_DELTA_LAG_SECONDS = int(os.getenv('EXPORT_DELTA_LAG_SECONDS', 60))
+
 @shared_task(bind=True)
-def export_user_quiz_data(self, user_id, filters=None):
+def export_user_quiz_data(self, user_id, filters=None, export_format='csv'):
     """
     Celery task to export user quiz data
     """
     try:
-        # Update task state
-        self.update_state(state='PROGRESS', meta={'status': 'Generating CSV data...'})
-        
-        # Generate CSV data
-        csv_content = generate_quiz_csv_data(user_id, filters)
-        
-        # Update task state
-        self.update_state(state='PROGRESS', meta={'status': 'Export completed'})
-        
-        return {
-            'status': 'SUCCESS',
-            'csv_content': csv_content,
-            'filename': f"user_export_{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            'message': 'Export completed successfully'
-        }
+        filename = f"user_export_{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return run_export(self, user_id, filename, dict(filters or {}, user_id=user_id), export_format)
         
     except Exception as e:
         return {
@@ -36,26 +31,24 @@ def export_user_quiz_data(self, user_id, filters=None):
         }
 
 @shared_task(bind=True)
-def export_admin_quiz_data(self, user_id, filters=None):
+def export_admin_quiz_data(self, user_id, filters=None, export_format='csv', mode='full', since=None, fingerprint=None):
     """
     Celery task to export admin quiz data
+
+    In 'delta' mode only scores created or changed after `since` are exported;
+    without `since`, the export resumes from where the owner's last delta
+    export of the same filters stopped. A full export started with a
+    fingerprint is recorded for reuse by identical requests.
     """
     try:
-        # Update task state
-        self.update_state(state='PROGRESS', meta={'status': 'Generating CSV data...'})
-        
-        # Generate CSV data
-        csv_content = generate_admin_csv_data(filters)
-        
-        # Update task state
-        self.update_state(state='PROGRESS', meta={'status': 'Export completed'})
-        
-        return {
-            'status': 'SUCCESS',
-            'csv_content': csv_content,
-            'filename': f"admin_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            'message': 'Export completed successfully'
-        }
+        if mode == 'delta':
+            filename = f"admin_delta_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            return run_delta_export(self, user_id, filename, filters or {}, export_format, since)
+        filename = f"admin_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        result = run_export(self, user_id, filename, filters, export_format)
+        if fingerprint:
+            record_export_artifact(fingerprint, dict(result, task_id=self.request.id))
+        return result
         
     except Exception as e:
         return {
@@ -63,85 +56,25 @@ def export_admin_quiz_data(self, user_id, filters=None):
             'error': str(e),
             'message': 'Export failed'
         }
+    finally:
+        if fingerprint:
+            release_export_run(fingerprint)
 
-def generate_quiz_csv_data(user_id, filters=None):
-    """Generate CSV data for user's quiz details"""
-    # Base query to get quiz details
-    query = db.session.query(
-        Score.id.label('score_id'),
-        Score.quiz_id,
-        Score.user_id,
-        Score.total_scored,
-        Score.total_questions,
-        Score.timestamp,
-        Quiz.name.label('quiz_name'),
-        Quiz.date_of_quiz,
-        Quiz.time_duration,
-        Quiz.remarks,
-        Chapter.id.label('chapter_id'),
-        Chapter.name.label('chapter_name'),
-        Subject.id.label('subject_id'),
-        Subject.name.label('subject_name'),
-        User.username,
-        User.full_name
-    ).join(
-        Quiz, Score.quiz_id == Quiz.id
-    ).join(
-        Chapter, Quiz.chapter_id == Chapter.id
-    ).join(
-        Subject, Chapter.subject_id == Subject.id
-    ).join(
-        User, Score.user_id == User.id
-    ).filter(
-        Score.user_id == user_id
-    )
-    
-    # Add date filters if provided
-    if filters:
-        start_date = filters.get('start_date')
-        end_date = filters.get('end_date')
-        
-        if start_date:
-            query = query.filter(Score.timestamp >= start_date)
-        if end_date:
-            query = query.filter(Score.timestamp <= end_date)
-    
-    # Order by timestamp descending
-    query = query.order_by(Score.timestamp.desc())
-    results = query.all()
-    
-    # Create CSV data
-    csv_data = io.StringIO()
-    csv_writer = csv.writer(csv_data)
-    
-    # Write header
-    csv_writer.writerow([
-        'Score ID', 'Quiz ID', 'User ID', 'Username', 'Full Name',
-        'Subject ID', 'Subject Name', 'Chapter ID', 'Chapter Name',
-        'Quiz Name', 'Total Scored', 'Total Questions', 'Percentage Score',
-        'Quiz Date', 'Quiz Duration', 'Quiz Remarks', 'Attempt Timestamp'
-    ])
-    
-    # Write data rows
-    for row in results:
-        percentage = round((row.total_scored / row.total_questions * 100), 2) if row.total_questions > 0 else 0
-        
-        csv_writer.writerow([
-            row.score_id, row.quiz_id, row.user_id, row.username,
-            row.full_name or '', row.subject_id, row.subject_name,
-            row.chapter_id, row.chapter_name, row.quiz_name,
-            row.total_scored, row.total_questions, f"{percentage}%",
-            row.date_of_quiz.strftime('%Y-%m-%d') if row.date_of_quiz else '',
-            str(row.time_duration) if row.time_duration else '',
-            row.remarks or '',
-            row.timestamp.strftime('%Y-%m-%d %H:%M:%S') if row.timestamp else ''
-        ])
-    
-    return csv_data.getvalue()
+EXPORT_HEADER = [
+    'Score ID', 'Quiz ID', 'User ID', 'Username', 'Full Name',
+    'Subject ID', 'Subject Name', 'Chapter ID', 'Chapter Name',
+    'Quiz Name', 'Total Scored', 'Total Questions', 'Percentage Score',
+    'Quiz Date', 'Quiz Duration', 'Quiz Remarks', 'Attempt Timestamp', 'Last Modified'
+]
+
+def build_export_query(filters=None, since=None, until=None):
+    """
+    Quiz attempt rows for an export, most recent first.
 
-def generate_admin_csv_data(filters=None):
-    """Generate CSV data for admin export"""
-    # Base query for all quiz details
+    Passing `until` makes it a delta query: only scores changed before
+    `until` and after the `since` watermark, in (updated_at, id) order so
+    the last row exported is the next watermark.
+    """
     query = db.session.query(
         Score.id.label('score_id'),
         Score.quiz_id,
@@ -149,6 +82,7 @@ def generate_admin_csv_data(filters=None):
         Score.total_scored,
         Score.total_questions,
         Score.timestamp,
+        Score.updated_at,
         Quiz.name.label('quiz_name'),
         Quiz.date_of_quiz,
         Quiz.time_duration,
@@ -183,37 +117,169 @@ def generate_admin_csv_data(filters=None):
         if subject_id:
             query = query.filter(Subject.id == subject_id)
         if user_id:
-            query = query.filter(User.id == user_id)
+            query = query.filter(Score.user_id == user_id)
+    
+    if until is not None:
+        query = query.filter(Score.updated_at < until)
+        if since:
+            query = query.filter(or_(
+                Score.updated_at > since['updated_at'],
+                and_(Score.updated_at == since['updated_at'], Score.id > since['score_id'])
+            ))
+        return query.order_by(Score.updated_at, Score.id)
     
     # Order by timestamp descending
-    query = query.order_by(Score.timestamp.desc())
-    results = query.all()
+    return query.order_by(Score.timestamp.desc())
+
+def export_row(row):
+    percentage = round((row.total_scored / row.total_questions * 100), 2) if row.total_questions else 0
+    return [
+        row.score_id, row.quiz_id, row.user_id, row.username,
+        row.full_name or '', row.subject_id, row.subject_name,
+        row.chapter_id, row.chapter_name, row.quiz_name,
+        row.total_scored, row.total_questions, f"{percentage}%",
+        row.date_of_quiz.strftime('%Y-%m-%d') if row.date_of_quiz else '',
+        str(row.time_duration) if row.time_duration else '',
+        row.remarks or '',
+        row.timestamp.strftime('%Y-%m-%d %H:%M:%S') if row.timestamp else '',
+        row.updated_at.strftime('%Y-%m-%d %H:%M:%S') if row.updated_at else ''
+    ]
+
+def export_record(row):
+    """One NDJSON line: the CSV columns with typed values"""
+    return {
+        'score_id': row.score_id,
+        'quiz_id': row.quiz_id,
+        'user_id': row.user_id,
+        'username': row.username,
+        'full_name': row.full_name,
+        'subject_id': row.subject_id,
+        'subject_name': row.subject_name,
+        'chapter_id': row.chapter_id,
+        'chapter_name': row.chapter_name,
+        'quiz_name': row.quiz_name,
+        'total_scored': row.total_scored,
+        'total_questions': row.total_questions,
+        'percentage': round((row.total_scored / row.total_questions * 100), 2) if row.total_questions else 0,
+        'quiz_date': row.date_of_quiz.isoformat() if row.date_of_quiz else None,
+        'quiz_duration': str(row.time_duration) if row.time_duration else None,
+        'quiz_remarks': row.remarks,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+        'updated_at': row.updated_at.isoformat() if row.updated_at else None
+    }
+
+def write_export(task, export_id, query, export_format):
+    """
+    Stream an export query into a file on disk; returns the row count and the last row.
+
+    Rows are fetched EXPORT_BATCH_SIZE at a time with yield_per and written
+    (and compressed, for .gz formats) one by one, so memory stays flat
+    however many scores match.
+    """
+    rows = 0
+    row = None
+    with open_export_file(export_id, export_format) as f:
+        if export_format.startswith('ndjson'):
+            def write(row):
+                f.write(json.dumps(export_record(row)) + '\n')
+        else:
+            csv_writer = csv.writer(f)
+            csv_writer.writerow(EXPORT_HEADER)
+            def write(row):
+                csv_writer.writerow(export_row(row))
+        
+        for row in query.yield_per(EXPORT_BATCH_SIZE):
+            write(row)
+            rows += 1
+            if rows % EXPORT_BATCH_SIZE == 0:
+                task.update_state(state='PROGRESS', meta={'status': f'Exported {rows} rows...', 'current': rows})
+    return rows, row
+
+def run_export(task, owner_id, filename, filters, export_format='csv'):
+    """Write an export file and return the task result, which points at the file instead of holding it"""
+    task.update_state(state='PROGRESS', meta={'status': f'Generating {export_format} data...'})
     
-    # Create CSV data
-    csv_data = io.StringIO()
-    csv_writer = csv.writer(csv_data)
+    export_id = new_export_id()
+    filename += EXPORT_FORMATS[export_format]['suffix']
+    rows, _ = write_export(task, export_id, build_export_query(filters), export_format)
+    meta = publish_export(export_id, owner_id, filename, rows, export_format)
     
-    # Write header
-    csv_writer.writerow([
-        'Score ID', 'Quiz ID', 'User ID', 'Username', 'Full Name',
-        'Subject ID', 'Subject Name', 'Chapter ID', 'Chapter Name',
-        'Quiz Name', 'Total Scored', 'Total Questions', 'Percentage Score',
-        'Quiz Date', 'Quiz Duration', 'Quiz Remarks', 'Attempt Timestamp'
-    ])
+    return export_result(meta)
+
+def export_result(meta):
+    """The task result for a published export"""
+    return {
+        'status': 'SUCCESS',
+        'export_id': meta['export_id'],
+        'filename': meta['filename'],
+        'format': meta['format'],
+        'rows': meta['rows'],
+        'size': meta['size'],
+        'expires_at': meta['expires_at'],
+        'download_url': f"/export/download/{meta['export_id']}",
+        'message': 'Export completed successfully'
+    }
+
+def delta_feed(filters):
+    """Key a watermark by the export's filters, so each filtered feed resumes on its own"""
+    return json.dumps(filters, sort_keys=True, default=str)
+
+def serialize_watermark(watermark):
+    if not watermark:
+        return None
+    return {'updated_at': watermark['updated_at'].isoformat(), 'score_id': watermark['score_id']}
+
+def run_delta_export(task, owner_id, filename, filters, export_format='csv', since=None):
+    """
+    Export the scores changed since a watermark, with a manifest holding the next one.
+
+    `since` is {'updated_at': ISO timestamp, 'score_id': id}; when it is None
+    the owner's stored watermark for these filters is used, and with neither
+    everything is exported. The new watermark is stored once the file is
+    published, so a failed export is simply retried from the old one.
+    """
+    task.update_state(state='PROGRESS', meta={'status': f'Generating {export_format} delta...'})
     
-    # Write data rows
-    for row in results:
-        percentage = round((row.total_scored / row.total_questions * 100), 2) if row.total_questions > 0 else 0
-        
-        csv_writer.writerow([
-            row.score_id, row.quiz_id, row.user_id, row.username,
-            row.full_name or '', row.subject_id, row.subject_name,
-            row.chapter_id, row.chapter_name, row.quiz_name,
-            row.total_scored, row.total_questions, f"{percentage}%",
-            row.date_of_quiz.strftime('%Y-%m-%d') if row.date_of_quiz else '',
-            str(row.time_duration) if row.time_duration else '',
-            row.remarks or '',
-            row.timestamp.strftime('%Y-%m-%d %H:%M:%S') if row.timestamp else ''
-        ])
+    feed = delta_feed(filters)
+    if since is not None:
+        since = {'updated_at': datetime.fromisoformat(since['updated_at']), 'score_id': int(since['score_id'])}
+    else:
+        stored = db.session.get(ExportWatermark, (owner_id, feed))
+        if stored:
+            since = {'updated_at': stored.updated_at, 'score_id': stored.score_id}
+    until = datetime.utcnow() - timedelta(seconds=EXPORT_DELTA_LAG_SECONDS)
+    
+    export_id = new_export_id()
+    filename += EXPORT_FORMATS[export_format]['suffix']
+    rows, last = write_export(task, export_id, build_export_query(filters, since, until), export_format)
+    watermark = {'updated_at': last.updated_at, 'score_id': last.score_id} if last else since
     
-    return csv_data.getvalue() 
\ No newline at end of file
+    manifest = {
+        'mode': 'delta',
+        'filters': filters,
+        'since': serialize_watermark(since),
+        'watermark': serialize_watermark(watermark),
+        'until': until.isoformat(),
+        'rows': rows
+    }
+    meta = publish_export(export_id, owner_id, filename, rows, export_format, manifest=manifest)
+    
+    if watermark:
+        db.session.merge(ExportWatermark(
+            owner_id=owner_id, feed=feed,
+            updated_at=watermark['updated_at'], score_id=watermark['score_id'],
+            export_id=export_id, exported_at=datetime.utcnow()
+        ))
+        db.session.commit()
+    
+    result = export_result(meta)
+    result['manifest'] = manifest
+    result['manifest_url'] = f"/export/manifest/{export_id}"
+    return result
+
+@shared_task(bind=True)
+def cleanup_export_files(self):
+    """Delete export files past their expiry"""
+    removed = cleanup_expired_exports()
+    print(f"Removed {removed} expired export files")
+    return {'removed': removed}
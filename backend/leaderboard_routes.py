@@ -0,0 +1,110 @@
+from flask import Blueprint, request, jsonify
+from models import db, User
+from flask_jwt_extended import jwt_required
+from leaderboards import LEADERBOARD_SCOPES, leaderboard_key
+from redis_store import cache_store
+
+leaderboard_bp = Blueprint('leaderboard_bp', __name__)
+
+MAX_LEADERBOARD_LIMIT = 100
+
+
+def leaderboard_entries(members, first_rank):
+    """Attach usernames (one query) and ranks to [(user_id, score), ...] from ZREVRANGE"""
+    user_ids = [int(user_id) for user_id, _ in members]
+    users = {
+        u.id: u for u in db.session.query(User.id, User.username, User.full_name).filter(User.id.in_(user_ids))
+    } if user_ids else {}
+    return [
+        {
+            'rank': first_rank + i,
+            'user_id': user_id,
+            'username': users[user_id].username if user_id in users else None,
+            'full_name': users[user_id].full_name if user_id in users else None,
+            'score': int(score)
+        }
+        for i, (user_id, (_, score)) in enumerate(zip(user_ids, members))
+    ]
+
+
+def read_int_arg(name, default, maximum):
+    value = int(request.args.get(name, default))
+    if value < 1 or value > maximum:
+        raise ValueError(f'{name} must be between 1 and {maximum}')
+    return value
+
+
+@leaderboard_bp.route('/leaderboards/<scope>/<int:scope_id>', methods=['GET'])
+@jwt_required()
+def get_leaderboard_top(scope, scope_id):
+    """Top-K members of a quiz/chapter/subject leaderboard"""
+    if scope not in LEADERBOARD_SCOPES:
+        return jsonify({'error': f"scope must be one of {', '.join(LEADERBOARD_SCOPES)}"}), 404
+
+    try:
+        limit = read_int_arg('limit', 10, MAX_LEADERBOARD_LIMIT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    key = leaderboard_key(scope, scope_id)
+    board = cache_store.execute(lambda r: (r.zrevrange(key, 0, limit - 1, withscores=True), r.zcard(key)))
+    if board is None:
+        return jsonify({'error': 'Leaderboard unavailable'}), 503
+
+    members, total = board
+    return jsonify({
+        'scope': scope,
+        'scope_id': scope_id,
+        'total_members': total,
+        'leaders': leaderboard_entries(members, 1)
+    }), 200
+
+
+@leaderboard_bp.route('/leaderboards/<scope>/<int:scope_id>/users/<int:user_id>', methods=['GET'])
+@jwt_required()
+def get_leaderboard_user(scope, scope_id, user_id):
+    """A user's rank and score on a leaderboard, with ?around=N neighbours on each side"""
+    if scope not in LEADERBOARD_SCOPES:
+        return jsonify({'error': f"scope must be one of {', '.join(LEADERBOARD_SCOPES)}"}), 404
+
+    try:
+        around = int(request.args.get('around', 0))
+        if around < 0 or around > MAX_LEADERBOARD_LIMIT:
+            raise ValueError(f'around must be between 0 and {MAX_LEADERBOARD_LIMIT}')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    key = leaderboard_key(scope, scope_id)
+
+    def read(r):
+        pipe = r.pipeline(transaction=False)
+        pipe.zrevrank(key, user_id)
+        pipe.zscore(key, user_id)
+        pipe.zcard(key)
+        rank, score, total = pipe.execute()
+        neighbours = []
+        if rank is not None and around:
+            start = max(rank - around, 0)
+            neighbours = (start, r.zrevrange(key, start, rank + around, withscores=True))
+        return rank, score, total, neighbours
+
+    board = cache_store.execute(read)
+    if board is None:
+        return jsonify({'error': 'Leaderboard unavailable'}), 503
+
+    rank, score, total, neighbours = board
+    if rank is None:
+        return jsonify({'error': 'User is not on this leaderboard'}), 404
+
+    result = {
+        'scope': scope,
+        'scope_id': scope_id,
+        'user_id': user_id,
+        'rank': rank + 1,
+        'score': int(score),
+        'total_members': total
+    }
+    if neighbours:
+        start, members = neighbours
+        result['neighbours'] = leaderboard_entries(members, start + 1)
+    return jsonify(result), 200
@@ -0,0 +1,207 @@
+import uuid
+import redis
+from sqlalchemy import event, select, func, inspect
+from sqlalchemy.orm import Session
+from models import Score, Quiz, Chapter, Subject
+from redis_store import cache_store, bulk_client
+
+# A member's leaderboard score is their best single score within the scope,
+# so a new attempt only ever raises it (ZADD GT) and never needs SQL
+LEADERBOARD_SCOPES = ('quiz', 'chapter', 'subject')
+REBUILD_BATCH_SIZE = 5000
+# Boards are built under temporary keys that expire if a rebuild dies half way
+REBUILD_TEMP_KEY_SECONDS = 3600
+
+
+def leaderboard_key(scope, scope_id):
+    return f"leaderboard:{scope}:{scope_id}"
+
+
+def quiz_scopes(connection, quiz_ids):
+    """Map quiz id -> (chapter_id, subject_id)"""
+    if not quiz_ids:
+        return {}
+    rows = connection.execute(
+        select(Quiz.id, Quiz.chapter_id, Chapter.subject_id).join(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).where(Quiz.id.in_(quiz_ids))
+    )
+    return {row.id: (row.chapter_id, row.subject_id) for row in rows}
+
+
+def best_score(connection, user_id, scope_column, scope_id):
+    """The user's best remaining score in a scope, read inside the current transaction"""
+    return connection.execute(
+        select(func.max(Score.total_scored)).select_from(Score).join(
+            Quiz, Score.quiz_id == Quiz.id
+        ).join(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).where(
+            Score.user_id == user_id,
+            scope_column == scope_id
+        )
+    ).scalar()
+
+
+@event.listens_for(Session, "before_flush")
+def collect_leaderboard_changes(session, flush_context, instances):
+    """Note which boards this flush touches while quiz/chapter rows still exist"""
+    raised = []
+    reset = set()
+    dropped = []
+    moved = []
+
+    for obj in session.new:
+        if isinstance(obj, Score) and obj.total_scored is not None:
+            raised.append((obj.user_id, obj.quiz_id, obj.total_scored))
+
+    for obj in session.dirty:
+        if isinstance(obj, Score) and session.is_modified(obj):
+            reset.add((obj.user_id, obj.quiz_id))
+        elif isinstance(obj, Quiz) and inspect(obj).attrs.chapter_id.history.has_changes():
+            moved.append(obj)
+
+    for obj in session.deleted:
+        if isinstance(obj, Score):
+            reset.add((obj.user_id, obj.quiz_id))
+        elif isinstance(obj, (Quiz, Chapter, Subject)):
+            dropped.append(leaderboard_key(obj.__tablename__, obj.id))
+
+    if not raised and not reset and not dropped and not moved:
+        return
+
+    connection = session.connection()
+    scopes = quiz_scopes(
+        connection,
+        {quiz_id for _, quiz_id, _ in raised} | {quiz_id for _, quiz_id in reset} | {quiz.id for quiz in moved}
+    )
+    pending = session.info.setdefault('leaderboard_pending', {'raised': [], 'reset': [], 'dropped': []})
+    for user_id, quiz_id, score in raised:
+        if quiz_id in scopes:
+            pending['raised'].append((user_id, (quiz_id, *scopes[quiz_id]), score))
+    for user_id, quiz_id in reset:
+        if quiz_id in scopes:
+            pending['reset'].append((user_id, (quiz_id, *scopes[quiz_id])))
+    for quiz in moved:
+        # A quiz moved to another chapter: its scorers' old and new chapter
+        # and subject boards are resolved again once the move is flushed
+        if quiz.id not in scopes:
+            continue
+        new_subject_id = connection.execute(
+            select(Chapter.subject_id).where(Chapter.id == quiz.chapter_id)
+        ).scalar()
+        user_ids = connection.execute(
+            select(Score.user_id).where(Score.quiz_id == quiz.id).distinct()
+        ).scalars().all()
+        for user_id in user_ids:
+            pending['reset'].append((user_id, (quiz.id, *scopes[quiz.id])))
+            if new_subject_id is not None:
+                pending['reset'].append((user_id, (quiz.id, quiz.chapter_id, new_subject_id)))
+    pending['dropped'].extend(dropped)
+
+
+@event.listens_for(Session, "after_flush")
+def resolve_leaderboard_resets(session, flush_context):
+    """Work out the absolute best scores for updated/deleted attempts from the flushed rows"""
+    pending = session.info.get('leaderboard_pending')
+    if not pending or not pending['reset']:
+        return
+
+    connection = session.connection()
+    resolved = pending.setdefault('resolved', [])
+    for user_id, scope_ids in pending['reset']:
+        for scope, scope_column, scope_id in zip(LEADERBOARD_SCOPES, (Quiz.id, Chapter.id, Chapter.subject_id), scope_ids):
+            resolved.append((leaderboard_key(scope, scope_id), user_id, best_score(connection, user_id, scope_column, scope_id)))
+    pending['reset'] = []
+
+
+@event.listens_for(Session, "after_commit")
+def publish_leaderboard_changes(session):
+    pending = session.info.pop('leaderboard_pending', None)
+    if not pending:
+        return
+
+    def apply(r):
+        pipe = r.pipeline()
+        for user_id, scope_ids, score in pending['raised']:
+            for scope, scope_id in zip(LEADERBOARD_SCOPES, scope_ids):
+                pipe.zadd(leaderboard_key(scope, scope_id), {user_id: score}, gt=True)
+        for key, user_id, score in pending.get('resolved', []):
+            if score is None:
+                pipe.zrem(key, user_id)
+            else:
+                pipe.zadd(key, {user_id: score})
+        for key in pending['dropped']:
+            pipe.delete(key)
+        pipe.execute()
+
+    cache_store.execute(apply)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_leaderboard_changes(session):
+    session.info.pop('leaderboard_pending', None)
+
+
+def rebuild_leaderboards(connection):
+    """Rebuild every quiz, chapter and subject leaderboard from the score table (cold start)"""
+    best_per_quiz = connection.execute(
+        select(
+            Score.user_id,
+            Score.quiz_id,
+            Quiz.chapter_id,
+            Chapter.subject_id,
+            func.max(Score.total_scored).label('best')
+        ).join(
+            Quiz, Score.quiz_id == Quiz.id
+        ).join(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).where(
+            Score.total_scored.isnot(None)
+        ).group_by(
+            Score.user_id, Score.quiz_id, Quiz.chapter_id, Chapter.subject_id
+        )
+    )
+
+    boards = {}
+    for row in best_per_quiz:
+        for scope, scope_id in zip(LEADERBOARD_SCOPES, (row.quiz_id, row.chapter_id, row.subject_id)):
+            board = boards.setdefault(leaderboard_key(scope, scope_id), {})
+            board[row.user_id] = max(board.get(row.user_id, row.best), row.best)
+
+    # Build every board under a temporary key, then swap them in with RENAME
+    # so readers never see a half-built board. Pipelines are sent in batches
+    # on a dedicated client so no single reply waits on the whole rebuild.
+    prefix = f"leaderboard_rebuild:{uuid.uuid4().hex}:"
+    try:
+        r = bulk_client()
+        pipe = r.pipeline(transaction=False)
+        queued = 0
+        for key, members in boards.items():
+            items = list(members.items())
+            for i in range(0, len(items), REBUILD_BATCH_SIZE):
+                pipe.zadd(prefix + key, dict(items[i:i + REBUILD_BATCH_SIZE]))
+                queued += 1
+            pipe.expire(prefix + key, REBUILD_TEMP_KEY_SECONDS)
+            queued += 1
+            if queued >= REBUILD_BATCH_SIZE:
+                pipe.execute()
+                queued = 0
+        pipe.execute()
+
+        keys = list(boards)
+        for i in range(0, len(keys), REBUILD_BATCH_SIZE):
+            pipe = r.pipeline()
+            for key in keys[i:i + REBUILD_BATCH_SIZE]:
+                pipe.rename(prefix + key, key)
+                pipe.persist(key)
+            pipe.execute()
+
+        # Boards with no scores left (their quiz or chapter lost every score)
+        stale = [key for key in r.scan_iter(match='leaderboard:*', count=REBUILD_BATCH_SIZE) if key not in boards]
+        for i in range(0, len(stale), REBUILD_BATCH_SIZE):
+            r.delete(*stale[i:i + REBUILD_BATCH_SIZE])
+    except redis.RedisError as e:
+        print(f"Leaderboard rebuild failed: {e}")
+        return None
+    return len(boards)
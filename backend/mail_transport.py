@@ -0,0 +1,174 @@
+import atexit
+import os
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+# Email configuration
+SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
+SMTP_USERNAME = os.getenv('SMTP_USERNAME', 'projectaaron11@gmail.com')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', 'xypc lhco tpoq bvza')
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() in ('1', 'true', 'yes')
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', 30))  # seconds
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', 4))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', 100))
+
+# The session dropped (idle timeout, server restart): reconnect and retry once
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class SMTPConnection:
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.sent = 0
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+
+
+class SMTPPool:
+    """
+    A small pool of authenticated SMTP sessions shared by every send.
+
+    Each session is opened (connect, STARTTLS, login) once and reused for up
+    to max_messages messages before being recycled. At most `size` sessions
+    exist; a sender waits for a free one rather than opening more. A session
+    that turns out to be dead is replaced and the message retried once.
+    """
+
+    def __init__(self, host, port, username=None, password=None, starttls=True,
+                 size=SMTP_POOL_SIZE, max_messages=SMTP_MAX_MESSAGES_PER_CONNECTION,
+                 timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []
+        self._lock = threading.Lock()
+        self.counters = {
+            'sent': 0, 'failed': 0, 'connections_opened': 0, 'reconnects': 0,
+            'total_latency': 0.0, 'max_latency': 0.0
+        }
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.counters['connections_opened'] += 1
+        return SMTPConnection(smtp)
+
+    def _acquire(self):
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, connection):
+        if connection is not None:
+            if connection.sent >= self.max_messages:
+                connection.close()
+            else:
+                with self._lock:
+                    self._idle.append(connection)
+        self._slots.release()
+
+    def send(self, msg):
+        """Send an email.message.Message over a pooled session; returns the send latency in seconds"""
+        start = time.monotonic()
+        connection = self._acquire()
+        try:
+            try:
+                connection.smtp.send_message(msg)
+            except RECONNECT_ERRORS:
+                connection.smtp.close()
+                connection = None
+                connection = self._connect()
+                self.counters['reconnects'] += 1
+                connection.smtp.send_message(msg)
+            connection.sent += 1
+        except Exception:
+            # Unknown session state after a failed send: don't hand it out again
+            if connection is not None:
+                connection.close()
+                connection = None
+            self.counters['failed'] += 1
+            raise
+        finally:
+            self._release(connection)
+
+        latency = time.monotonic() - start
+        self.counters['sent'] += 1
+        self.counters['total_latency'] += latency
+        self.counters['max_latency'] = max(self.counters['max_latency'], latency)
+        return latency
+
+    def close(self):
+        """Quit every idle session"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def stats(self):
+        sent = self.counters['sent']
+        return {
+            **self.counters,
+            'idle_connections': len(self._idle),
+            'avg_latency': self.counters['total_latency'] / sent if sent else 0.0
+        }
+
+
+smtp_pool = SMTPPool(
+    SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, starttls=SMTP_STARTTLS
+)
+atexit.register(smtp_pool.close)
+
+
+def build_message(to_email, subject, html_content, sender=SMTP_USERNAME):
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = to_email
+
+    html_part = MIMEText(html_content, 'html')
+    msg.attach(html_part)
+    return msg
+
+
+def send_email(to_email, subject, html_content, pool=None):
+    """Send HTML email over the shared SMTP pool"""
+    pool = pool or smtp_pool
+    try:
+        latency = pool.send(build_message(to_email, subject, html_content))
+        print(f"Email sent to {to_email} in {latency * 1000:.0f} ms")
+        return True
+    except smtplib.SMTPAuthenticationError as e:
+        print(f"SMTP Authentication failed: {str(e)}")
+        return False
+    except smtplib.SMTPException as e:
+        print(f"SMTP error: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"Email sending failed: {str(e)}")
+        return False
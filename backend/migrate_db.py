@@ -36,4 +36,45 @@ if __name__ == '__main__':
         else:
             print("created_at column already exists in quiz table.")
         
+        # Answer keys and quiz take ETags follow quiz.content_version
+        if 'content_version' not in columns:
+            print("Adding content_version column to quiz table...")
+            with db.engine.begin() as conn:
+                conn.execute(db.text("ALTER TABLE quiz ADD COLUMN content_version INTEGER NOT NULL DEFAULT 1"))
+            print("content_version column added successfully!")
+        else:
+            print("content_version column already exists in quiz table.")
+        
+        # Delta exports track changes through score.updated_at
+        columns = [col['name'] for col in inspector.get_columns('score')]
+        if 'updated_at' not in columns:
+            print("Adding updated_at column to score table...")
+            with db.engine.begin() as conn:
+                conn.execute(db.text("ALTER TABLE score ADD COLUMN updated_at DATETIME"))
+                # Existing scores last changed when they were recorded
+                conn.execute(db.text("UPDATE score SET updated_at = COALESCE(timestamp, CURRENT_TIMESTAMP) WHERE updated_at IS NULL"))
+            print("updated_at column added successfully!")
+        else:
+            print("updated_at column already exists in score table.")
+        
+        # score_rollup is derived from the score table. The app creates it
+        # empty on startup, so always rebuild it in full (this is idempotent)
+        from score_rollups import rebuild_rollups
+        print("Rebuilding score_rollup from scores...")
+        db.create_all()
+        with db.engine.begin() as conn:
+            rebuild_rollups(conn)
+        print("score_rollup table rebuilt successfully!")
+        
+        # Create any secondary indexes declared on the models that are missing
+        for model in (Subject, Chapter, Quiz, Question, Score):
+            table = model.__table__
+            existing_indexes = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    print(f"Index {index.name} already exists on {table.name} table.")
+                    continue
+                print(f"Creating index {index.name} on {table.name} table...")
+                index.create(bind=db.engine)
+        
         print("Database migration completed successfully!") 
\ No newline at end of file
@@ -4,10 +4,23 @@ from datetime import datetime
 import sqlite3
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
+from config import Config
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    """Apply the configured pragma profile to every new SQLite connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in Config.SQLITE_PRAGMAS.items():
+        if value:
+            cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -41,6 +54,10 @@ class Chapter(db.Model):
     description = db.Column(db.Text)
     subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_chapter_subject_id', 'subject_id'),
+    )
+
     quizzes = db.relationship('Quiz', backref='chapter', lazy=True, cascade="all, delete-orphan")
 
     def __repr__(self):
@@ -55,6 +72,13 @@ class Quiz(db.Model):
     time_duration = db.Column(db.Time)
     remarks = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Raised in the same transaction as every write to the quiz or its questions (catalog_cache.py)
+    content_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __table_args__ = (
+        db.Index('ix_quiz_chapter_id', 'chapter_id'),
+        db.Index('ix_quiz_created_at', 'created_at'),
+    )
 
     questions = db.relationship('Question', backref='quiz', lazy=True, cascade="all, delete-orphan")
     scores = db.relationship('Score', backref='quiz', lazy=True, cascade="all, delete-orphan")
@@ -72,6 +96,10 @@ class Question(db.Model):
     option4 = db.Column(db.String(200))
     correct_option = db.Column(db.Integer)  # optional
 
+    __table_args__ = (
+        db.Index('ix_question_quiz_id', 'quiz_id'),
+    )
+
     def __repr__(self):
         return f"<Question {self.id}>"
 
@@ -83,9 +111,96 @@ class Score(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     total_scored = db.Column(db.Integer)
     total_questions = db.Column(db.Integer)
+    # Bumped on every change; delta exports resume from the last (updated_at, id) they saw
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Indexes for the per-user history, per-quiz ranking, date-range and delta export queries
+    __table_args__ = (
+        db.Index('ix_score_user_id_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_score_quiz_id_total_scored', 'quiz_id', 'total_scored'),
+        db.Index('ix_score_timestamp', 'timestamp'),
+        db.Index('ix_score_updated_at_id', 'updated_at', 'id'),
+    )
 
     # Define relationship with cascade delete
     user = db.relationship('User', backref=db.backref('scores', lazy=True, cascade="all, delete-orphan"))
 
     def __repr__(self):
-        return f"<Score User {self.user_id} - Quiz {self.quiz_id}>"
\ No newline at end of file
+        return f"<Score User {self.user_id} - Quiz {self.quiz_id}>"
+
+class ScoreRollup(db.Model):
+    """Per user/chapter score aggregates, kept in step with Score writes by score_rollups.py"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    subject_id = db.Column(db.Integer, primary_key=True)
+    chapter_id = db.Column(db.Integer, primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total_scored = db.Column(db.Integer, nullable=False, default=0)
+    total_questions = db.Column(db.Integer, nullable=False, default=0)
+    best_score = db.Column(db.Integer)
+    last_attempt = db.Column(db.DateTime)
+
+    # No foreign keys: rows are derived data and are rewritten in the same
+    # flush that deletes the users/chapters they point at
+    __table_args__ = (
+        db.Index('ix_score_rollup_subject_id', 'subject_id'),
+    )
+
+    def __repr__(self):
+        return f"<ScoreRollup User {self.user_id} - Chapter {self.chapter_id}>"
+
+class EmailOutbox(db.Model):
+    """Emails waiting to be sent; written by producers and drained by email_outbox.py dispatchers"""
+    id = db.Column(db.Integer, primary_key=True)
+    # Producers set a key per logical email (e.g. monthly-report:2024-12:42)
+    # so a rerun enqueues nothing that is already queued or sent
+    dedupe_key = db.Column(db.String(200), nullable=False, unique=True)
+    to_email = db.Column(db.String(200), nullable=False)
+    subject = db.Column(db.String(300), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lease_owner = db.Column(db.String(64))
+    lease_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    # Dispatchers look for due pending rows and expired leases
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+        db.Index('ix_email_outbox_status_lease_until', 'status', 'lease_until'),
+    )
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.dedupe_key} ({self.status})>"
+
+class ExportWatermark(db.Model):
+    """Where an owner's last delta export of a feed stopped; the next delta export resumes after it"""
+    owner_id = db.Column(db.Integer, primary_key=True)
+    # Canonical form of the export filters, so differently filtered feeds keep separate watermarks
+    feed = db.Column(db.String(200), primary_key=True)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    score_id = db.Column(db.Integer, nullable=False)
+    export_id = db.Column(db.String(32))
+    exported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ExportWatermark {self.owner_id}:{self.feed} @ {self.score_id}>"
+
+class CatalogChange(db.Model):
+    """One Subject/Chapter/Quiz/Question write; the id is the catalog change version clients sync from"""
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)  # subject, chapter, quiz, question
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # created, updated, deleted
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # AUTOINCREMENT on SQLite, so versions are never reused after old changes are pruned
+    __table_args__ = (
+        db.Index('ix_catalog_change_changed_at', 'changed_at'),
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f"<CatalogChange {self.id} {self.action} {self.entity_type} {self.entity_id}>"
@@ -0,0 +1,91 @@
+from flask import request
+from models import db
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+
+def wants_full_listing():
+    """True when the client explicitly opted in to the old unpaginated response (?all=true)"""
+    return request.args.get('all', '').lower() in ('1', 'true', 'yes')
+
+
+def parse_page_args():
+    """Read ?limit= and ?after= from the query string, raising ValueError on bad input"""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_LIMIT))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1 or limit > MAX_PAGE_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_LIMIT}')
+
+    after = request.args.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            raise ValueError('after must be an integer id')
+    return limit, after
+
+
+def parse_fields(available):
+    """Read ?fields=a,b,c and validate it against the available field names"""
+    raw = request.args.get('fields')
+    if not raw:
+        return list(available)
+
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}")
+    return fields
+
+
+def format_value(value):
+    """Make a column value JSON friendly"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def keyset_page(columns, key_column, filters=(), formatters=None, expanders=None):
+    """
+    Build one page of a listing ordered by key_column (the primary key).
+
+    columns maps output field names to column expressions; only the fields
+    requested with ?fields= are put in the SELECT. expanders maps field names
+    to callables that attach nested collections to the whole page of items in
+    a single query. The id field is always returned since it is the cursor.
+    """
+    formatters = formatters or {}
+    expanders = expanders or {}
+    limit, after = parse_page_args()
+    fields = parse_fields(list(columns) + list(expanders))
+
+    selected = [name for name in fields if name in columns]
+    if 'id' not in selected:
+        selected.insert(0, 'id')
+
+    query = db.session.query(
+        *[columns[name].label(name) for name in selected]
+    ).filter(*filters)
+    if after is not None:
+        query = query.filter(key_column > after)
+    rows = query.order_by(key_column).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [
+        {name: formatters.get(name, format_value)(getattr(row, name)) for name in selected}
+        for row in rows
+    ]
+    for name in fields:
+        if name in expanders and items:
+            expanders[name](items)
+
+    return {
+        'items': items,
+        'limit': limit,
+        'next_after': items[-1]['id'] if has_more else None
+    }
@@ -1,10 +1,31 @@
 from flask import Blueprint, request, jsonify
+import csv
 from models import db
 from models import Question
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from pagination import wants_full_listing, keyset_page
+from catalog_cache import cached_catalog_response
+from streaming import wants_streaming, stream_json_array, STREAM_BATCH_SIZE
+from catalog_import import collect_csv, collect_json, validate_import, import_catalog, MAX_REPORTED_ERRORS
 
 question_bp = Blueprint('question_bp', __name__)
 
+QUESTION_LIST_COLUMNS = {
+    'id': Question.id,
+    'question_statement': Question.question_statement,
+    'quiz_id': Question.quiz_id,
+    'option1': Question.option1,
+    'option2': Question.option2,
+    'option3': Question.option3,
+    'option4': Question.option4,
+    'correct_option': Question.correct_option
+}
+
+# What non-admins see: students are graded by /quizzes/<quiz_id>/attempts
+QUESTION_PUBLIC_COLUMNS = {
+    name: column for name, column in QUESTION_LIST_COLUMNS.items() if name != 'correct_option'
+}
+
 @question_bp.route('/question', methods=['POST'])
 @jwt_required()
 def create_question():
@@ -41,6 +62,62 @@ def create_question():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@question_bp.route('/questions/import', methods=['POST'])
+@jwt_required()
+def import_questions():
+    """
+    Bulk import questions, or whole quizzes with their questions, from JSON or CSV.
+
+    JSON: {"questions": [{"quiz_id", "question_statement", "option1".."option4", "correct_option"}]}
+    and/or {"quizzes": [{"name", "chapter_id", "date_of_quiz", "time_duration", "remarks", "questions": [...]}]}.
+    CSV (text/csv body or a "file" upload): the question columns plus either
+    quiz_id, or quiz_name and chapter_id to create quizzes.
+
+    Every row is validated first; if any is invalid nothing is written and
+    the per-row errors are returned. Otherwise everything is inserted in
+    one transaction.
+    """
+    current_user = get_jwt_identity()
+    
+    if current_user['role'] != 'admin':
+        return jsonify({"message": "Access forbidden"}), 403
+
+    try:
+        if 'file' in request.files:
+            quiz_specs, question_specs = collect_csv(request.files['file'].read().decode('utf-8-sig'))
+        elif request.mimetype == 'text/csv':
+            quiz_specs, question_specs = collect_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                return jsonify({'error': 'Send JSON with questions and/or quizzes, or a CSV file'}), 400
+            quiz_specs, question_specs = collect_json(data)
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': f'Could not read CSV: {str(e)}'}), 400
+
+    if not quiz_specs and not question_specs:
+        return jsonify({'error': 'Nothing to import'}), 400
+
+    try:
+        quizzes, questions, errors = validate_import(quiz_specs, question_specs)
+        if errors:
+            return jsonify({
+                'error': f'Import rejected: {len(errors)} errors, nothing was imported',
+                'error_count': len(errors),
+                'errors': errors[:MAX_REPORTED_ERRORS]
+            }), 400
+
+        quiz_ids, question_count = import_catalog(quizzes, questions)
+        return jsonify({
+            'message': 'Import completed',
+            'quizzes_created': len(quiz_ids),
+            'questions_created': question_count,
+            'quiz_ids': quiz_ids
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
 @question_bp.route('/question/<int:question_id>', methods=['POST'])
 @jwt_required()
 def update_question(question_id):
@@ -87,25 +164,32 @@ def delete_question(question_id):
 
 @question_bp.route('/questions', methods=['GET'])
 def get_all_questions():
+    verify_jwt_in_request(optional=True)
+    current_user = get_jwt_identity()
+    is_admin = bool(current_user) and current_user['role'] == 'admin'
+    columns = QUESTION_LIST_COLUMNS if is_admin else QUESTION_PUBLIC_COLUMNS
+
+    if wants_streaming():
+        questions = db.session.query(
+            *columns.values()
+        ).order_by(Question.id).yield_per(STREAM_BATCH_SIZE)
+        return stream_json_array(questions, serialize=lambda q: dict(zip(columns, q)))
+
+    if not wants_full_listing():
+        try:
+            return jsonify(keyset_page(columns, Question.id)), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
     try:
-        questions = Question.query.all()
-        result = [
-            {
-                'id': q.id,
-                'question_statement': q.question_statement,
-                'quiz_id': q.quiz_id,
-                'option1': q.option1,
-                'option2': q.option2,
-                'option3': q.option3,
-                'option4': q.option4,
-                'correct_option': q.correct_option
-            } for q in questions
-        ]
+        questions = db.session.query(*columns.values()).order_by(Question.id).all()
+        result = [dict(zip(columns, q)) for q in questions]
         return jsonify(result), 200
     except:
         return jsonify({'error': 'Error getting questions'}), 400
 
 @question_bp.route('/quizzes/<int:quiz_id>/questions', methods=['GET'])
+@cached_catalog_response
 def get_questions_by_quiz(quiz_id):
     try:
         questions = Question.query.filter_by(quiz_id=quiz_id).all()
@@ -116,8 +200,7 @@ def get_questions_by_quiz(quiz_id):
                 'option1': q.option1,
                 'option2': q.option2,
                 'option3': q.option3,
-                'option4': q.option4,
-                'correct_option': q.correct_option
+                'option4': q.option4
             } for q in questions
         ]
         return jsonify(result), 200
@@ -1,12 +1,125 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from models import db
-from models import Quiz
+from models import Quiz, Chapter, Question
 from datetime import datetime, timedelta
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from functools import partial
+from sqlalchemy import select
+from pagination import wants_full_listing, keyset_page
+from catalog_cache import cached_catalog_response, cached_quiz_version, CATALOG_CACHE_EXPIRE_SECONDS
+from redis_store import cache_store
+import json
+from streaming import wants_streaming, stream_json_array, STREAM_BATCH_SIZE
 
 
 quiz_bp = Blueprint('quiz_bp', __name__)
 
+QUIZ_LIST_COLUMNS = {
+    'id': Quiz.id,
+    'name': Quiz.name,
+    'chapter_id': Quiz.chapter_id,
+    'chapter_name': select(Chapter.name).where(Chapter.id == Quiz.chapter_id).scalar_subquery(),
+    'date_of_quiz': Quiz.date_of_quiz,
+    'time_duration': Quiz.time_duration,
+    'remarks': Quiz.remarks,
+    'created_at': Quiz.created_at
+}
+
+QUIZ_LIST_FORMATTERS = {
+    'chapter_name': lambda name: name or 'Unknown Chapter',
+    'time_duration': lambda t: (t.hour * 60 + t.minute) if t else None
+}
+
+QUESTION_COLUMNS = (
+    Question.id,
+    Question.quiz_id,
+    Question.question_statement,
+    Question.option1,
+    Question.option2,
+    Question.option3,
+    Question.option4,
+    Question.correct_option
+)
+
+def question_payload(qu, with_answers=False):
+    """Serialize a question row the way the quiz listings expose it; correct_option only with_answers"""
+    payload = {
+        'id': qu.id,
+        'name': qu.question_statement,
+        'question_statement': qu.question_statement,
+        'quiz_id': qu.quiz_id,
+        'option1': qu.option1,
+        'option2': qu.option2,
+        'option3': qu.option3,
+        'option4': qu.option4
+    }
+    if with_answers:
+        payload['correct_option'] = qu.correct_option
+    return payload
+
+def attach_quiz_questions(items, with_answers=False):
+    """Attach the questions of a page of quizzes using a single query"""
+    questions_by_quiz = {item['id']: [] for item in items}
+    for item in items:
+        item['questions'] = questions_by_quiz[item['id']]
+
+    questions = db.session.query(*QUESTION_COLUMNS).filter(
+        Question.quiz_id.in_(questions_by_quiz)
+    ).order_by(Question.id).all()
+    for qu in questions:
+        questions_by_quiz[qu.quiz_id].append(question_payload(qu, with_answers))
+
+def iter_all_quizzes(batch_size=STREAM_BATCH_SIZE, with_answers=False):
+    """
+    Yield every quiz with its chapter name and questions (with their
+    correct options only when with_answers is set).
+
+    Uses exactly two queries (quizzes joined to chapters, then all questions
+    ordered by quiz) read in batches and merged in step, so the cost does not
+    grow with the number of quizzes and only one quiz is held at a time.
+    """
+    quizzes = db.session.query(
+        Quiz.id,
+        Quiz.name,
+        Quiz.chapter_id,
+        Chapter.name.label('chapter_name'),
+        Quiz.date_of_quiz,
+        Quiz.time_duration,
+        Quiz.remarks,
+        Quiz.created_at
+    ).outerjoin(
+        Chapter, Quiz.chapter_id == Chapter.id
+    ).order_by(Quiz.id).yield_per(batch_size)
+
+    questions = iter(
+        db.session.query(*QUESTION_COLUMNS).order_by(Question.quiz_id, Question.id).yield_per(batch_size)
+    )
+    qu = next(questions, None)
+
+    for q in quizzes:
+        while qu is not None and qu.quiz_id < q.id:
+            qu = next(questions, None)
+        quiz_questions = []
+        while qu is not None and qu.quiz_id == q.id:
+            quiz_questions.append(question_payload(qu, with_answers))
+            qu = next(questions, None)
+
+        yield {
+            'name': q.name,
+            'id': q.id,
+            'chapter_id': q.chapter_id,
+            'chapter_name': q.chapter_name or 'Unknown Chapter',
+            'date_of_quiz': q.date_of_quiz.isoformat() if q.date_of_quiz else None,
+            'time_duration': (q.time_duration.hour * 60 + q.time_duration.minute) if q.time_duration else None,
+            'remarks': q.remarks,
+            'created_at': q.created_at.isoformat() if q.created_at else None,
+            'questions': quiz_questions
+        }
+
+def serialize_all_quizzes(with_answers=False):
+    """Serialize every quiz with its chapter name and questions as a list"""
+    return list(iter_all_quizzes(with_answers=with_answers))
+
 @quiz_bp.route('/test', methods=['GET'])
 def test():
     return jsonify({'message': 'Quiz API is working!'}), 200
@@ -94,44 +207,102 @@ def delete_quiz(quiz_id):
 
 @quiz_bp.route('/quizzes', methods=['GET'])
 def get_all_quizzes():
+    # Correct options are only listed for admins; students are graded by /quizzes/<quiz_id>/attempts
+    verify_jwt_in_request(optional=True)
+    current_user = get_jwt_identity()
+    with_answers = bool(current_user) and current_user['role'] == 'admin'
+
+    if wants_streaming():
+        return stream_json_array(iter_all_quizzes(with_answers=with_answers))
+
+    if not wants_full_listing():
+        try:
+            page = keyset_page(
+                QUIZ_LIST_COLUMNS, Quiz.id,
+                formatters=QUIZ_LIST_FORMATTERS,
+                expanders={'questions': partial(attach_quiz_questions, with_answers=with_answers)}
+            )
+            return jsonify(page), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
     try:
-        print("Fetching all quizzes...")  # Debug log
-        quizzes = Quiz.query.all()
-        print(f"Found {len(quizzes)} quizzes")  # Debug log
-        
-        result = [
+        return jsonify(serialize_all_quizzes(with_answers)), 200
+    except Exception as e:
+        print(f"Error in get_all_quizzes: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+
+def take_quiz_body(quiz_id):
+    """JSON for taking one quiz: its details and questions without the correct options, or None"""
+    quiz = db.session.query(
+        Quiz.id, Quiz.name, Quiz.chapter_id, Quiz.date_of_quiz, Quiz.time_duration, Quiz.remarks
+    ).filter(Quiz.id == quiz_id).first()
+    if not quiz:
+        return None
+
+    questions = db.session.query(
+        Question.id, Question.question_statement,
+        Question.option1, Question.option2, Question.option3, Question.option4
+    ).filter(Question.quiz_id == quiz_id).order_by(Question.id).all()
+    return json.dumps({
+        'id': quiz.id,
+        'name': quiz.name,
+        'chapter_id': quiz.chapter_id,
+        'date_of_quiz': quiz.date_of_quiz.isoformat() if quiz.date_of_quiz else None,
+        'time_duration': (quiz.time_duration.hour * 60 + quiz.time_duration.minute) if quiz.time_duration else None,
+        'remarks': quiz.remarks,
+        'question_count': len(questions),
+        'questions': [
             {
-                'name': q.name,
-                'id': q.id,
-                'chapter_id': q.chapter_id,
-                'chapter_name': q.chapter.name if q.chapter else 'Unknown Chapter',  # Added null check
-                'date_of_quiz': q.date_of_quiz.isoformat() if q.date_of_quiz else None,
-                'time_duration': (q.time_duration.hour * 60 + q.time_duration.minute) if q.time_duration else None,
-                'remarks': q.remarks,
-                'created_at': q.created_at.isoformat() if q.created_at else None,
-                'questions': [
-                    {
-                        'id': qu.id,
-                        'name': qu.question_statement,
-                        'question_statement': qu.question_statement,
-                        'quiz_id': qu.quiz_id,
-                        'option1': qu.option1,
-                        'option2': qu.option2,
-                        'option3': qu.option3,
-                        'option4': qu.option4,
-                        'correct_option': qu.correct_option
-                    } for qu in q.questions
-                ]
-            } for q in quizzes
+                'id': qu.id,
+                'question_statement': qu.question_statement,
+                'option1': qu.option1,
+                'option2': qu.option2,
+                'option3': qu.option3,
+                'option4': qu.option4
+            } for qu in questions
         ]
-        print("Returning quiz data:", result)  # Debug log
-        return jsonify(result), 200
+    })
+
+@quiz_bp.route('/quizzes/<int:quiz_id>/take', methods=['GET'])
+def take_quiz(quiz_id):
+    """
+    One quiz's questions for a student, without answers.
+
+    The body is serialized once per quiz content version and cached in
+    Redis. The version is also the ETag, so a client revalidating with
+    If-None-Match gets a 304 from a single Redis read and no database
+    access while the version's Redis copy is warm. An unknown quiz is a
+    404 before anything is cached.
+    """
+    try:
+        version = cached_quiz_version(quiz_id)
+        if version is None:
+            return jsonify({'error': 'Quiz not found'}), 404
+
+        etag = f"quiz-{quiz_id}-{version}"
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            cache_key = f"quiz_take:{quiz_id}:{version}"
+            body = cache_store.lookup(lambda r: r.get(cache_key))
+            if body is None:
+                body = take_quiz_body(quiz_id)
+                if body is None:
+                    return jsonify({'error': 'Quiz not found'}), 404
+                cache_store.execute(lambda r: r.setex(cache_key, CATALOG_CACHE_EXPIRE_SECONDS, body))
+            response = Response(body, mimetype='application/json')
+
+        response.set_etag(etag)
+        # Always revalidate: an unchanged quiz costs a 304, an edited one is seen at once
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
-        print(f"Error in get_all_quizzes: {str(e)}")  # Debug log
         return jsonify({'error': str(e)}), 400
 
-
 @quiz_bp.route('/chapters/<int:chapter_id>/quizzes', methods=['GET'])
+@cached_catalog_response
 def get_quizzes_by_chapter(chapter_id):
     try:
         quizzes = Quiz.query.filter_by(chapter_id=chapter_id).all()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Standalone script to backfill or rebuild derived score aggregates from the
+score table (after a restore, a bulk import or when first deploying them).
+"""
+from flask import Flask
+from models import db, ScoreRollup
+from config import Config
+from score_rollups import rebuild_rollups
+from leaderboards import rebuild_leaderboards
+
+app = Flask(__name__)
+app.config.from_object(Config)
+db.init_app(app)
+
+if __name__ == '__main__':
+    with app.app_context():
+        db.create_all()
+
+        print("Rebuilding score rollups...")
+        rebuild_rollups(db.session.connection())
+        db.session.commit()
+        print(f"Score rollups rebuilt: {ScoreRollup.query.count()} rows.")
+
+        print("Rebuilding leaderboards...")
+        boards = rebuild_leaderboards(db.session.connection())
+        if boards is None:
+            print("Redis unavailable, leaderboards were not rebuilt.")
+        else:
+            print(f"Leaderboards rebuilt: {boards} boards.")
+
+        print("Aggregate rebuild completed successfully!")
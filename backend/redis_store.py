@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+import redis
+
+REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
+REDIS_CACHE_DB = int(os.getenv('REDIS_CACHE_DB', 2))
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 0.25))  # seconds
+REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT', 0.25))  # seconds
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('REDIS_BREAKER_FAILURES', 3))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv('REDIS_BREAKER_COOLDOWN', 30))
+# Maintenance jobs (rebuilds) send large pipelines that outlast the API timeout
+REDIS_BULK_SOCKET_TIMEOUT = float(os.getenv('REDIS_BULK_SOCKET_TIMEOUT', 30))  # seconds
+
+_FAILED = object()
+
+
+def redis_url(db):
+    return f"redis://{REDIS_HOST}:{REDIS_PORT}/{db}"
+
+
+def bulk_client(db=REDIS_CACHE_DB):
+    """
+    A standalone client with a long socket timeout for maintenance jobs.
+
+    It bypasses the shared pool and circuit breaker, so a slow bulk write
+    neither times out nor opens the breaker for the API's cache reads.
+    """
+    return redis.Redis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=db,
+        socket_timeout=REDIS_BULK_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        decode_responses=True
+    )
+
+
+class RedisStore:
+    """
+    Shared Redis access for the API and the Celery workers.
+
+    The connection pool is only created on first use, so importing a module
+    never blocks on Redis. Calls go through execute(), which uses short socket
+    timeouts and a circuit breaker: after BREAKER_FAILURE_THRESHOLD consecutive
+    errors Redis is skipped for BREAKER_COOLDOWN_SECONDS and callers get their
+    default straight away, falling back to SQL without waiting on a socket.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._client = None
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+        self.counters = {'hits': 0, 'misses': 0, 'errors': 0, 'skipped': 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    pool = redis.ConnectionPool(
+                        host=REDIS_HOST,
+                        port=REDIS_PORT,
+                        db=self.db,
+                        max_connections=REDIS_MAX_CONNECTIONS,
+                        socket_timeout=REDIS_SOCKET_TIMEOUT,
+                        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+                        health_check_interval=30,
+                        decode_responses=True
+                    )
+                    self._client = redis.Redis(connection_pool=pool)
+        return self._client
+
+    def is_open(self):
+        """True while the breaker is skipping Redis"""
+        return time.monotonic() < self._open_until
+
+    def execute(self, operation, default=None):
+        """Run operation(client) and return its result, or default if Redis is skipped or fails"""
+        if self.is_open():
+            self.counters['skipped'] += 1
+            return default
+        try:
+            result = operation(self.client)
+        except redis.RedisError as e:
+            self._record_failure(e)
+            return default
+        self._failures = 0
+        return result
+
+    def lookup(self, operation):
+        """execute() for cache reads: an empty result counts as a miss, anything else as a hit"""
+        result = self.execute(operation, default=_FAILED)
+        if result is _FAILED:
+            return None
+        if result:
+            self.counters['hits'] += 1
+            return result
+        self.counters['misses'] += 1
+        return None
+
+    def _record_failure(self, error):
+        self.counters['errors'] += 1
+        # Still counting up from the last trip, so one failure after the
+        # cooldown (half-open) re-opens the breaker immediately
+        self._failures += 1
+        print(f"Redis error: {error}")
+        if self._failures >= BREAKER_FAILURE_THRESHOLD:
+            self._open_until = time.monotonic() + BREAKER_COOLDOWN_SECONDS
+            print(f"Redis circuit open, skipping Redis for {BREAKER_COOLDOWN_SECONDS}s")
+
+    def stats(self):
+        return {
+            'db': self.db,
+            'circuit': 'open' if self.is_open() else 'closed',
+            'consecutive_failures': self._failures,
+            **self.counters
+        }
+
+
+cache_store = RedisStore(REDIS_CACHE_DB)
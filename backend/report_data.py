@@ -0,0 +1,116 @@
+from models import db, Score, Quiz, Chapter, Subject
+from sqlalchemy import func, desc
+from datetime import datetime
+
+
+def month_bounds(month_year):
+    """Return [start, end) datetimes for a "YYYY-MM" month"""
+    start_date = datetime.strptime(month_year, "%Y-%m")
+    if start_date.month == 12:
+        end_date = start_date.replace(year=start_date.year + 1, month=1)
+    else:
+        end_date = start_date.replace(month=start_date.month + 1)
+    return start_date, end_date
+
+
+def monthly_quiz_rankings(start_date, end_date, user_ids=None):
+    """
+    Rank every user on every quiz they attempted in the period, in one query.
+
+    A user's standing on a quiz is their best score on it that month; ties
+    share a rank. Returns {user_id: {quiz_id: rank}}.
+    """
+    best = db.session.query(
+        Score.user_id,
+        Score.quiz_id,
+        func.max(Score.total_scored).label('best_scored')
+    ).filter(
+        Score.timestamp >= start_date,
+        Score.timestamp < end_date
+    ).group_by(
+        Score.user_id, Score.quiz_id
+    ).subquery()
+
+    ranked = db.session.query(
+        best.c.user_id,
+        best.c.quiz_id,
+        func.rank().over(
+            partition_by=best.c.quiz_id,
+            order_by=desc(best.c.best_scored)
+        ).label('rank')
+    ).subquery()
+
+    query = db.session.query(ranked.c.user_id, ranked.c.quiz_id, ranked.c.rank)
+    if user_ids is not None:
+        query = query.filter(ranked.c.user_id.in_(user_ids))
+
+    rankings = {}
+    for row in query:
+        rankings.setdefault(row.user_id, {})[row.quiz_id] = row.rank
+    return rankings
+
+
+def rankings_as_rows(rankings, user_ids):
+    """The given users' rankings as [user_id, quiz_id, rank] rows, which survive a JSON task payload"""
+    return [
+        [user_id, quiz_id, rank]
+        for user_id in user_ids
+        for quiz_id, rank in rankings.get(user_id, {}).items()
+    ]
+
+
+def rankings_from_rows(rows):
+    rankings = {}
+    for user_id, quiz_id, rank in rows:
+        rankings.setdefault(user_id, {})[quiz_id] = rank
+    return rankings
+
+
+def load_monthly_report_data(month_year, user_ids=None, quiz_rankings=None):
+    """
+    Load the scores and quiz rankings for a month's reports with two queries.
+
+    The result is shared by every per-user render of the run, so the number
+    of queries does not grow with the number of users. Pass user_ids to
+    restrict the scores (ranks are still computed against all users), and
+    quiz_rankings when the month's ranks were already computed for the run.
+    """
+    start_date, end_date = month_bounds(month_year)
+
+    query = db.session.query(
+        Score.id,
+        Score.user_id,
+        Score.quiz_id,
+        Score.total_scored,
+        Score.total_questions,
+        Score.timestamp,
+        Quiz.name.label('quiz_name'),
+        Chapter.name.label('chapter_name'),
+        Subject.name.label('subject_name')
+    ).join(
+        Quiz, Score.quiz_id == Quiz.id
+    ).join(
+        Chapter, Quiz.chapter_id == Chapter.id
+    ).join(
+        Subject, Chapter.subject_id == Subject.id
+    ).filter(
+        Score.timestamp >= start_date,
+        Score.timestamp < end_date
+    )
+    if user_ids is not None:
+        query = query.filter(Score.user_id.in_(user_ids))
+
+    scores = {}
+    for row in query.order_by(Score.user_id, Score.timestamp.desc()):
+        scores.setdefault(row.user_id, []).append(row)
+
+    return {
+        'month_year': month_year,
+        'start_date': start_date,
+        'end_date': end_date,
+        'scores': scores,
+        'quiz_rankings': (
+            monthly_quiz_rankings(start_date, end_date, user_ids)
+            if quiz_rankings is None else quiz_rankings
+        )
+    }
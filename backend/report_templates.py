@@ -0,0 +1,86 @@
+from flask import current_app
+from markupsafe import Markup
+from datetime import datetime
+from models import User
+from report_data import load_monthly_report_data
+
+# Compiled once by Flask's Jinja loader and kept in its template cache
+MONTHLY_REPORT_TEMPLATE = 'monthly_report.html'
+MONTHLY_REPORT_HEAD_TEMPLATE = 'monthly_report_head.html'
+
+_report_heads = {}
+
+
+def render_report_head(month_year):
+    """The doctype, CSS and header of a month's report; rendered once per month and reused"""
+    head = _report_heads.get(month_year)
+    if head is None:
+        template = current_app.jinja_env.get_template(MONTHLY_REPORT_HEAD_TEMPLATE)
+        head = Markup(template.render(month_year=month_year))
+        # Keep the cache small: reports are generated for one month at a time
+        if len(_report_heads) >= 12:
+            _report_heads.clear()
+        _report_heads[month_year] = head
+    return head
+
+
+def render_monthly_report(month_year, **context):
+    """Render one user's monthly report from the shared compiled template"""
+    template = current_app.jinja_env.get_template(MONTHLY_REPORT_TEMPLATE)
+    return template.render(
+        report_head=render_report_head(month_year),
+        month_year=month_year,
+        datetime=datetime,
+        **context
+    )
+
+
+def generate_monthly_report_html(user_id, month_year, report_data=None):
+    """Generate HTML content for monthly report (report_data comes from load_monthly_report_data)"""
+    
+    # Get user details
+    user = User.query.get(user_id)
+    if not user:
+        return None
+    
+    if report_data is None:
+        try:
+            report_data = load_monthly_report_data(month_year, user_ids=[user_id])
+        except ValueError:
+            return None
+
+    monthly_scores = report_data['scores'].get(user_id, [])
+    quiz_rankings = report_data['quiz_rankings'].get(user_id, {})
+    
+    # Calculate statistics
+    total_quizzes = len(monthly_scores)
+    total_questions = sum(score.total_questions or 0 for score in monthly_scores)
+    total_scored = sum(score.total_scored or 0 for score in monthly_scores)
+    average_score = round((total_scored / total_questions * 100), 2) if total_questions > 0 else 0
+    
+    # Get subject-wise breakdown
+    subject_stats = {}
+    for score in monthly_scores:
+        subject = score.subject_name
+        if subject not in subject_stats:
+            subject_stats[subject] = {'quizzes': 0, 'total_scored': 0, 'total_questions': 0}
+        subject_stats[subject]['quizzes'] += 1
+        subject_stats[subject]['total_scored'] += score.total_scored or 0
+        subject_stats[subject]['total_questions'] += score.total_questions or 0
+    
+    # Calculate subject averages
+    for subject in subject_stats:
+        stats = subject_stats[subject]
+        stats['average'] = round((stats['total_scored'] / stats['total_questions'] * 100), 2) if stats['total_questions'] > 0 else 0
+    
+    return render_monthly_report(
+        month_year,
+        user=user,
+        total_quizzes=total_quizzes,
+        total_questions=total_questions,
+        total_scored=total_scored,
+        average_score=average_score,
+        subject_stats=subject_stats,
+        monthly_scores=monthly_scores,
+        quiz_rankings=quiz_rankings
+    )
@@ -2,9 +2,21 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models import db, User
 from datetime import timedelta
+from pagination import wants_full_listing, keyset_page
+from redis_store import cache_store
+from email_outbox import outbox_depth
 
 api = Blueprint('api', __name__)
 
+USER_LIST_COLUMNS = {
+    'id': User.id,
+    'username': User.username,
+    'role': User.role,
+    'full_name': User.full_name,
+    'qualification': User.qualification,
+    'dob': User.dob
+}
+
 @api.route('/register', methods=['POST'])
 def register():
     data = request.json
@@ -62,6 +74,13 @@ def get_all_users():
     
     if current_user['role'] != 'admin':
         return jsonify({"message": "Access forbidden"}), 403
+
+    if not wants_full_listing():
+        try:
+            page = keyset_page(USER_LIST_COLUMNS, User.id, filters=(User.role != 'admin',))
+            return jsonify(page), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
     users = User.query.filter(User.role != 'admin').all()
     result = [
@@ -70,6 +89,26 @@ def get_all_users():
     ]
     return jsonify(result), 200
 
+@api.route('/admin/cache-stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    current_user = get_jwt_identity()
+    
+    if current_user['role'] != 'admin':
+        return jsonify({"message": "Access forbidden"}), 403
+    
+    return jsonify(cache_store.stats()), 200
+
+@api.route('/admin/email-outbox', methods=['GET'])
+@jwt_required()
+def get_email_outbox_depth():
+    current_user = get_jwt_identity()
+    
+    if current_user['role'] != 'admin':
+        return jsonify({"message": "Access forbidden"}), 403
+    
+    return jsonify(outbox_depth()), 200
+
 @api.route('/admin/user/<int:user_id>', methods=['DELETE'])
 @jwt_required()
 def delete_users(user_id):
@@ -0,0 +1,136 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Score
+from redis_store import cache_store
+from datetime import datetime
+import json
+import redis
+
+SCORE_CACHE_EXPIRE_SECONDS = 300
+ADMIN_SCORES_KEY = "all_scores_admin"
+# Set only once a hash holds every score; a hash without it is partial and
+# is treated as a cache miss
+CACHED_AT_FIELD = "_cached_at"
+# Raised by every write-through, so a fill can tell that the hash changed
+# while it was reading the database
+GENERATION_FIELD = "_generation"
+
+
+def user_scores_key(user_id):
+    return f"user_scores:{user_id}"
+
+
+def score_entry(score):
+    return {
+        'id': score.id,
+        'quiz_id': score.quiz_id,
+        'user_id': score.user_id,
+        'total_scored': score.total_scored,
+        'total_questions': score.total_questions,
+        'timestamp': score.timestamp.isoformat() if score.timestamp else None
+    }
+
+
+def get_cached_scores(cache_key):
+    """Return (scores ordered by id, cache timestamp) from a complete score hash, or None"""
+    entries = cache_store.lookup(lambda r: r.hgetall(cache_key))
+    if not entries:
+        return None
+
+    cached_at = entries.pop(CACHED_AT_FIELD, None)
+    entries.pop(GENERATION_FIELD, None)
+    if cached_at is None:
+        return None
+    scores = sorted((json.loads(entry) for entry in entries.values()), key=lambda s: s['id'])
+    return scores, cached_at
+
+
+def cache_generation(cache_key):
+    """The hash's write-through generation; read it before the database read that fills the hash"""
+    return cache_store.execute(lambda r: r.hget(cache_key, GENERATION_FIELD))
+
+
+def cache_scores(cache_key, scores, generation):
+    """
+    Fill a score hash from a database read and return the cache timestamp.
+
+    generation is cache_generation() from before the read. The fill runs
+    under WATCH and is dropped if a score write-through changed the hash
+    since then, so a score created, updated or deleted during the read is
+    never overwritten or brought back; the next read fills the hash again.
+    """
+    cached_at = datetime.now().isoformat()
+
+    def fill(r):
+        with r.pipeline() as pipe:
+            try:
+                pipe.watch(cache_key)
+                if pipe.hget(cache_key, GENERATION_FIELD) != generation:
+                    return
+                pipe.multi()
+                for s in scores:
+                    pipe.hset(cache_key, s['id'], json.dumps(s))
+                pipe.hset(cache_key, CACHED_AT_FIELD, cached_at)
+                pipe.expire(cache_key, SCORE_CACHE_EXPIRE_SECONDS)
+                pipe.execute()
+            except redis.WatchError:
+                pass
+
+    cache_store.execute(fill)
+    return cached_at
+
+
+def write_through_score_changes(changes):
+    """Apply committed score writes to the per-user and admin hashes in one MULTI/EXEC"""
+    def apply(r):
+        touched = set()
+        pipe = r.pipeline()
+        for action, entry in changes:
+            for key in (user_scores_key(entry['user_id']), ADMIN_SCORES_KEY):
+                if action == 'set':
+                    pipe.hset(key, entry['id'], json.dumps(entry))
+                else:
+                    pipe.hdel(key, entry['id'])
+                touched.add(key)
+        for key in touched:
+            pipe.hincrby(key, GENERATION_FIELD, 1)
+        pipe.execute()
+
+        # A hash first created by a write-through still has to expire
+        touched = list(touched)
+        ttls = r.pipeline(transaction=False)
+        for key in touched:
+            ttls.ttl(key)
+        for key, ttl in zip(touched, ttls.execute()):
+            if ttl == -1:
+                r.expire(key, SCORE_CACHE_EXPIRE_SECONDS)
+
+    cache_store.execute(apply)
+
+
+@event.listens_for(Session, "after_flush")
+def track_score_changes(session, flush_context):
+    """Record created, updated and deleted scores (including cascades) of this transaction"""
+    changes = [
+        ('set', score_entry(obj)) for obj in session.new if isinstance(obj, Score)
+    ] + [
+        ('set', score_entry(obj)) for obj in session.dirty
+        if isinstance(obj, Score) and session.is_modified(obj)
+    ] + [
+        ('delete', {'id': obj.id, 'user_id': obj.user_id})
+        for obj in session.deleted if isinstance(obj, Score)
+    ]
+    if changes:
+        session.info.setdefault('score_changes', []).extend(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def publish_score_changes(session):
+    changes = session.info.pop('score_changes', None)
+    if changes:
+        write_through_score_changes(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_score_changes(session):
+    session.info.pop('score_changes', None)
@@ -0,0 +1,146 @@
+from sqlalchemy import event, select, update, insert, delete, case, or_, func, inspect
+from sqlalchemy.orm import Session
+from models import Score, Quiz, Chapter, ScoreRollup
+
+rollup = ScoreRollup.__table__
+
+
+def add_score_to_rollup(connection, score):
+    """Fold a newly inserted score into its (user, subject, chapter) row"""
+    quiz = connection.execute(
+        select(Quiz.chapter_id, Chapter.subject_id).join(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).where(Quiz.id == score.quiz_id)
+    ).first()
+    if quiz is None:
+        return
+
+    scored = score.total_scored or 0
+    questions = score.total_questions or 0
+    row = {
+        'user_id': score.user_id,
+        'subject_id': quiz.subject_id,
+        'chapter_id': quiz.chapter_id,
+        'attempts': 1,
+        'total_scored': scored,
+        'total_questions': questions,
+        'best_score': score.total_scored,
+        'last_attempt': score.timestamp
+    }
+    folded = {
+        'attempts': rollup.c.attempts + 1,
+        'total_scored': rollup.c.total_scored + scored,
+        'total_questions': rollup.c.total_questions + questions,
+        'best_score': case(
+            (or_(rollup.c.best_score.is_(None), rollup.c.best_score < scored), scored),
+            else_=rollup.c.best_score
+        ),
+        'last_attempt': case(
+            (or_(rollup.c.last_attempt.is_(None), rollup.c.last_attempt < score.timestamp), score.timestamp),
+            else_=rollup.c.last_attempt
+        )
+    }
+
+    # A single upsert, so two first attempts in the same chapter cannot
+    # both try to insert the row on databases without a global write lock
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        connection.execute(
+            dialect_insert(rollup).values(**row).on_conflict_do_update(
+                index_elements=['user_id', 'subject_id', 'chapter_id'], set_=folded
+            )
+        )
+        return
+
+    key = (
+        (rollup.c.user_id == score.user_id)
+        & (rollup.c.subject_id == quiz.subject_id)
+        & (rollup.c.chapter_id == quiz.chapter_id)
+    )
+    result = connection.execute(update(rollup).where(key).values(**folded))
+    if result.rowcount == 0:
+        connection.execute(insert(rollup).values(**row))
+
+
+def rebuild_rollups(connection, user_ids=None):
+    """
+    Recompute rollup rows from the score table.
+
+    With user_ids only those users' rows are rewritten, which reads just
+    their scores through the score user_id index; without it the whole
+    table is rebuilt (backfill).
+    """
+    delete_rows = delete(rollup)
+    aggregate = select(
+        Score.user_id,
+        Chapter.subject_id,
+        Chapter.id,
+        func.count(Score.id),
+        func.coalesce(func.sum(Score.total_scored), 0),
+        func.coalesce(func.sum(Score.total_questions), 0),
+        func.max(Score.total_scored),
+        func.max(Score.timestamp)
+    ).join(
+        Quiz, Score.quiz_id == Quiz.id
+    ).join(
+        Chapter, Quiz.chapter_id == Chapter.id
+    ).group_by(
+        Score.user_id, Chapter.subject_id, Chapter.id
+    )
+
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        delete_rows = delete_rows.where(rollup.c.user_id.in_(user_ids))
+        aggregate = aggregate.where(Score.user_id.in_(user_ids))
+
+    connection.execute(delete_rows)
+    connection.execute(
+        insert(rollup).from_select(
+            ['user_id', 'subject_id', 'chapter_id', 'attempts', 'total_scored',
+             'total_questions', 'best_score', 'last_attempt'],
+            aggregate
+        )
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def maintain_score_rollups(session, flush_context):
+    """Apply this flush's score writes to score_rollup inside the same transaction"""
+    inserted = []
+    rebuild_user_ids = set()
+
+    for obj in session.new:
+        if isinstance(obj, Score):
+            inserted.append(obj)
+
+    for obj in session.dirty:
+        if isinstance(obj, Score) and session.is_modified(obj):
+            state = inspect(obj)
+            rebuild_user_ids.add(obj.user_id)
+            rebuild_user_ids.update(state.attrs.user_id.history.deleted)
+        elif isinstance(obj, Quiz) and inspect(obj).attrs.chapter_id.history.has_changes():
+            # A quiz moved to another chapter: every user with a score on it is affected
+            rebuild_user_ids.update(
+                row.user_id for row in session.connection().execute(
+                    select(Score.user_id).where(Score.quiz_id == obj.id).distinct()
+                )
+            )
+
+    for obj in session.deleted:
+        if isinstance(obj, Score):
+            rebuild_user_ids.add(obj.user_id)
+
+    if not inserted and not rebuild_user_ids:
+        return
+
+    connection = session.connection()
+    for score in inserted:
+        if score.user_id not in rebuild_user_ids:
+            add_score_to_rollup(connection, score)
+    rebuild_rollups(connection, rebuild_user_ids)
@@ -2,56 +2,76 @@ from flask import Blueprint, request, jsonify
 from models import db, Score
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-import redis
-import json
+from pagination import wants_full_listing, keyset_page
+from streaming import wants_streaming, stream_json_array, STREAM_BATCH_SIZE
+import score_rollups
+import leaderboards
+from answer_keys import get_answer_key
+from score_cache import (
+    get_cached_scores, cache_generation, cache_scores, user_scores_key, score_entry, ADMIN_SCORES_KEY
+)
 
 score_bp = Blueprint('score_bp', __name__)
 
-redis_client = redis.Redis(host='localhost', port=6379, db=2, decode_responses=True)
-
-try:
-    redis_client.ping()
-    print("✅ Redis connection successful")
-except Exception as e:
-    print(f"❌ Redis connection failed: {e}")
-
-def get_cached_data(cache_key):
-    try:
-        cached_data = redis_client.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
-        return None
-    except Exception as e:
-        print(f"Redis cache error: {e}")
-        return None
-
-def set_cached_data(cache_key, data, expire_seconds=300):
+SCORE_LIST_COLUMNS = {
+    'id': Score.id,
+    'quiz_id': Score.quiz_id,
+    'user_id': Score.user_id,
+    'total_scored': Score.total_scored,
+    'total_questions': Score.total_questions,
+    'timestamp': Score.timestamp
+}
+
+def user_score_entries(scores):
+    """Per-user listings leave out the user_id of each score"""
+    return [{k: v for k, v in s.items() if k != 'user_id'} for s in scores]
+
+def get_user_scores_response(user_id):
+    """Shared body of /users/<id>/scores and /my-scores, served from the per-user score hash"""
+    cache_key = user_scores_key(user_id)
+    
     try:
-        redis_client.setex(cache_key, expire_seconds, json.dumps(data))
+        cached = get_cached_scores(cache_key)
+        if cached:
+            scores, cached_at = cached
+        else:
+            generation = cache_generation(cache_key)
+            scores = [score_entry(s) for s in Score.query.filter_by(user_id=user_id).order_by(Score.id).all()]
+            cached_at = cache_scores(cache_key, scores, generation)
+        
+        result = user_score_entries(scores)
+        return jsonify({
+            'scores': result,
+            'total_scores': len(result),
+            'cache_timestamp': cached_at
+        }), 200
     except Exception as e:
-        print(f"Redis cache error: {e}")
+        return jsonify({'error': str(e)}), 400
 
 @score_bp.route('/score', methods=['POST'])
 @jwt_required()
 def create_score():
+    """Record a score as given; admin only, students submit answers to /quizzes/<quiz_id>/attempts"""
     current_user = get_jwt_identity()
+
+    if current_user['role'] != 'admin':
+        return jsonify({"message": "Access forbidden"}), 403
+
     data = request.get_json()
 
     quiz_id = data.get('quiz_id')
     total_scored = data.get('total_scored')
     total_questions = data.get('total_questions')
-    user_id = data.get('user_id')
+    # Recorded for the admin unless another user is named
+    user_id = data.get('user_id') or current_user['id']
 
     if not quiz_id or total_scored is None:
         return jsonify({'error': 'quiz_id and total_scored are required'}), 400
-    
-    if not user_id:
-        return jsonify({'error': 'User ID not found'}), 400
 
     try:
         score = Score(
             quiz_id=quiz_id,
-            user_id=final_user_id,
+            user_id=user_id,
             total_scored=total_scored,
             total_questions=total_questions,
             timestamp=datetime.utcnow()
@@ -62,6 +82,53 @@ def create_score():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@score_bp.route('/quizzes/<int:quiz_id>/attempts', methods=['POST'])
+@jwt_required()
+def submit_attempt(quiz_id):
+    """
+    Grade a quiz attempt on the server and record the score.
+
+    Body: {"answers": {"<question_id>": <chosen option 1-4>, ...}}. The
+    score is computed from the cached answer key, never taken from the
+    client, and is recorded for the authenticated user.
+    """
+    current_user = get_jwt_identity()
+    data = request.get_json()
+
+    answers = data.get('answers') if data else None
+    if not isinstance(answers, dict):
+        return jsonify({'error': 'answers must map question ids to chosen options'}), 400
+
+    try:
+        answer_key = get_answer_key(quiz_id)
+        if not len(answer_key):
+            return jsonify({'error': 'Quiz not found or has no questions'}), 404
+
+        try:
+            total_scored = answer_key.grade(answers)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        score = Score(
+            quiz_id=quiz_id,
+            user_id=current_user['id'],
+            total_scored=total_scored,
+            total_questions=len(answer_key),
+            timestamp=datetime.utcnow()
+        )
+        db.session.add(score)
+        db.session.commit()
+        return jsonify({
+            'message': 'Attempt graded',
+            'id': score.id,
+            'total_scored': total_scored,
+            'total_questions': len(answer_key),
+            'percentage': round(total_scored / len(answer_key) * 100, 2),
+            'correct_options': answer_key.as_dict()
+        }), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
 @score_bp.route('/score/<int:score_id>', methods=['POST'])
 @jwt_required()
 def update_score(score_id):
@@ -108,40 +175,36 @@ def get_all_scores():
     if current_user['role'] != 'admin':
         return jsonify({"message": "Access forbidden"}), 403
 
-    cache_key = "all_scores_admin"
-    
+    if wants_streaming():
+        scores = db.session.query(
+            *SCORE_LIST_COLUMNS.values()
+        ).order_by(Score.id).yield_per(STREAM_BATCH_SIZE)
+        return stream_json_array(
+            scores,
+            serialize=score_entry,
+            key='scores',
+            count_key='total_scores'
+        )
+
+    if not wants_full_listing():
+        try:
+            return jsonify(keyset_page(SCORE_LIST_COLUMNS, Score.id)), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
     try:
-        cached_result = get_cached_data(cache_key)
-        if cached_result:
-            return jsonify({
-                'scores': cached_result['scores'],
-                'total_scores': cached_result['total_scores'],
-                'cache_timestamp': cached_result.get('timestamp')
-            }), 200
-        
-        scores = Score.query.all()
-        result = [
-            {
-                'id': s.id,
-                'quiz_id': s.quiz_id,
-                'user_id': s.user_id,
-                'total_scored': s.total_scored,
-                'total_questions': s.total_questions,
-                'timestamp': s.timestamp.isoformat() if s.timestamp else None
-            } for s in scores
-        ]
-        
-        cache_data = {
-            'scores': result,
-            'total_scores': len(result),
-            'timestamp': datetime.now().isoformat()
-        }
-        set_cached_data(cache_key, cache_data, 300)
+        cached = get_cached_scores(ADMIN_SCORES_KEY)
+        if cached:
+            result, cached_at = cached
+        else:
+            generation = cache_generation(ADMIN_SCORES_KEY)
+            result = [score_entry(s) for s in Score.query.order_by(Score.id).all()]
+            cached_at = cache_scores(ADMIN_SCORES_KEY, result, generation)
         
         return jsonify({
             'scores': result,
             'total_scores': len(result),
-            'cache_timestamp': cache_data['timestamp']
+            'cache_timestamp': cached_at
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -165,83 +228,10 @@ def get_scores_by_quiz(quiz_id):
 
 @score_bp.route('/users/<int:user_id>/scores', methods=['GET'])
 def get_scores_by_user(user_id):
-    cache_key = f"user_scores:{user_id}"
-    
-    try:
-        cached_result = get_cached_data(cache_key)
-        if cached_result:
-            return jsonify({
-                'scores': cached_result['scores'],
-                'total_scores': cached_result['total_scores'],
-                'cache_timestamp': cached_result.get('timestamp')
-            }), 200
-        
-        scores = Score.query.filter_by(user_id=user_id).all()
-        result = [
-            {
-                'id': s.id,
-                'quiz_id': s.quiz_id,
-                'total_scored': s.total_scored,
-                'total_questions': s.total_questions,
-                'timestamp': s.timestamp.isoformat() if s.timestamp else None
-            } for s in scores
-        ]
-        
-        cache_data = {
-            'scores': result,
-            'total_scores': len(result),
-            'timestamp': datetime.now().isoformat()
-        }
-        set_cached_data(cache_key, cache_data, 300)
-        
-        return jsonify({
-            'scores': result,
-            'total_scores': len(result),
-            'cache_timestamp': cache_data['timestamp']
-        }), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 400
+    return get_user_scores_response(user_id)
 
 @score_bp.route('/my-scores', methods=['GET'])
 @jwt_required()
 def get_my_scores():
     current_user = get_jwt_identity()
-    
-    cache_key = f"my_scores:{current_user['id']}"
-    
-    try:
-        cached_result = get_cached_data(cache_key)
-        if cached_result:
-            return jsonify({
-                'scores': cached_result['scores'],
-                'total_scores': cached_result['total_scores'],
-                'cache_timestamp': cached_result.get('timestamp')
-            }), 200
-        
-        scores = Score.query.filter_by(user_id=current_user['id']).all()
-        result = [
-            {
-                'id': s.id,
-                'quiz_id': s.quiz_id,
-                'total_scored': s.total_scored,
-                'total_questions': s.total_questions,
-                'timestamp': s.timestamp.isoformat() if s.timestamp else None
-            } for s in scores
-        ]
-        
-        cache_data = {
-            'scores': result,
-            'total_scores': len(result),
-            'timestamp': datetime.now().isoformat()
-        }
-        set_cached_data(cache_key, cache_data, 300)
-        
-        return jsonify({
-            'scores': result,
-            'total_scores': len(result),
-            'cache_timestamp': cache_data['timestamp']
-        }), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 400
-
-
+    return get_user_scores_response(current_user['id'])
@@ -0,0 +1,44 @@
+from flask import Response, request, stream_with_context
+import json
+
+STREAM_BATCH_SIZE = 1000
+
+
+def wants_streaming():
+    """True when the client asked for the full listing as a streamed response (?stream=true)"""
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def stream_json_array(rows, serialize=None, key=None, count_key=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Stream rows as a JSON array without building the whole list in memory.
+
+    rows is any iterable, normally a query with yield_per() so the database
+    is also read in batches. Encoded elements are flushed one batch at a time
+    and the response is sent with chunked transfer encoding. With key set the
+    array is wrapped as {"<key>": [...]}, and count_key adds the element count
+    after the array once it is known.
+    """
+    def generate():
+        yield '{%s: [' % json.dumps(key) if key else '['
+
+        count = 0
+        chunk = []
+        for row in rows:
+            item = serialize(row) if serialize else row
+            chunk.append(json.dumps(item) if count == 0 else ',' + json.dumps(item))
+            count += 1
+            if len(chunk) >= batch_size:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+
+        if not key:
+            yield ']'
+        elif count_key:
+            yield '], %s: %d}' % (json.dumps(count_key), count)
+        else:
+            yield ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
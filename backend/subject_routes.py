@@ -1,10 +1,34 @@
 from flask import Blueprint, request, jsonify
 from models import db
-from models import Subject
+from models import Subject, Chapter
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from pagination import wants_full_listing, keyset_page
+from catalog_cache import cached_catalog_response
 
 subject_bp = Blueprint('subject_bp', __name__)
 
+SUBJECT_LIST_COLUMNS = {
+    'id': Subject.id,
+    'name': Subject.name,
+    'description': Subject.description
+}
+
+def attach_subject_chapters(items):
+    """Attach the chapters of a page of subjects using a single query"""
+    chapters_by_subject = {item['id']: [] for item in items}
+    for item in items:
+        item['chapters'] = chapters_by_subject[item['id']]
+
+    chapters = db.session.query(
+        Chapter.id, Chapter.name, Chapter.description, Chapter.subject_id
+    ).filter(
+        Chapter.subject_id.in_(chapters_by_subject)
+    ).order_by(Chapter.id).all()
+    for c in chapters:
+        chapters_by_subject[c.subject_id].append(
+            {'id': c.id, 'name': c.name, 'description': c.description}
+        )
+
 # Create Subject
 @subject_bp.route('/subject', methods=['POST'])
 @jwt_required()
@@ -71,6 +95,21 @@ def get_all_subjects():
     
     if current_user['role'] != 'admin':
         return jsonify({"message": "Access forbidden"}), 403
+    return list_subjects()
+
+
+@cached_catalog_response
+def list_subjects():
+    if not wants_full_listing():
+        try:
+            page = keyset_page(
+                SUBJECT_LIST_COLUMNS, Subject.id,
+                expanders={'chapters': attach_subject_chapters}
+            )
+            return jsonify(page), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
     subjects = Subject.query.all()
     result = [
         {
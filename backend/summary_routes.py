@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
-from models import db, Score, Quiz, Chapter, Subject, User
+from models import db, Score, Quiz, Chapter, Subject, User, ScoreRollup
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func
+from sqlalchemy import func, extract, case, cast, or_, Float
+import score_rollups
 
 summary_bp = Blueprint('summary_bp', __name__)
 
@@ -15,15 +16,11 @@ def get_user_subject_quiz_summary(user_id):
         subject_summary = db.session.query(
             Subject.id.label('subject_id'),
             Subject.name.label('subject_name'),
-            func.count(Score.id).label('quiz_count')
-        ).join(
-            Chapter, Subject.id == Chapter.subject_id
-        ).join(
-            Quiz, Chapter.id == Quiz.chapter_id
+            func.sum(ScoreRollup.attempts).label('quiz_count')
         ).join(
-            Score, Quiz.id == Score.quiz_id
+            ScoreRollup, Subject.id == ScoreRollup.subject_id
         ).filter(
-            Score.user_id == user_id
+            ScoreRollup.user_id == user_id
         ).group_by(
             Subject.id, Subject.name
         ).all()
@@ -52,22 +49,24 @@ def get_user_monthly_quiz_summary(user_id):
     current_user = get_jwt_identity()
     
     try:
-        monthly_summary = db.session.execute(
-            db.text("""
-                SELECT 
-                    strftime('%Y-%m', timestamp) as month,
-                    COUNT(*) as quiz_count
-                FROM score 
-                WHERE user_id = :user_id
-                GROUP BY strftime('%Y-%m', timestamp)
-                ORDER BY month DESC
-            """),
-            {'user_id': user_id}
-        ).fetchall()
+        year = extract('year', Score.timestamp)
+        month = extract('month', Score.timestamp)
+        monthly_summary = db.session.query(
+            year.label('year'),
+            month.label('month'),
+            func.count(Score.id).label('quiz_count')
+        ).filter(
+            Score.user_id == user_id,
+            Score.timestamp.isnot(None)
+        ).group_by(
+            year, month
+        ).order_by(
+            year.desc(), month.desc()
+        ).all()
         
         result = [
             {
-                'month': row.month,
+                'month': f"{int(row.year):04d}-{int(row.month):02d}",
                 'quiz_count': row.quiz_count
             }
             for row in monthly_summary
@@ -91,47 +90,40 @@ def get_subject_top_scores():
         return jsonify({"message": "Access forbidden"}), 403
     
     try:
-        final_result = db.session.execute(
-            db.text("""
-                WITH RankedScores AS (
-                    SELECT 
-                        s.id as subject_id,
-                        s.name as subject_name,
-                        u.id as user_id,
-                        u.username,
-                        u.full_name,
-                        sc.total_scored as top_score,
-                        COALESCE(sc.total_questions, 0) as total_questions,
-                        CASE 
-                            WHEN sc.total_questions IS NULL OR sc.total_questions = 0 THEN 0
-                            ELSE ROUND((sc.total_scored * 100.0) / sc.total_questions, 2)
-                        END as percentage,
-                        ROW_NUMBER() OVER (PARTITION BY s.id ORDER BY sc.total_scored DESC, 
-                            CASE 
-                                WHEN sc.total_questions IS NULL OR sc.total_questions = 0 THEN 0
-                                ELSE ROUND((sc.total_scored * 100.0) / sc.total_questions, 2)
-                            END DESC) as rn
-                    FROM subject s
-                    JOIN chapter c ON s.id = c.subject_id
-                    JOIN quiz q ON c.id = q.chapter_id
-                    JOIN score sc ON q.id = sc.quiz_id
-                    JOIN user u ON sc.user_id = u.id
-                    WHERE sc.total_scored IS NOT NULL
-                )
-                SELECT 
-                    subject_id,
-                    subject_name,
-                    user_id,
-                    username,
-                    full_name,
-                    top_score,
-                    total_questions,
-                    percentage
-                FROM RankedScores
-                WHERE rn = 1
-                ORDER BY subject_name
-            """)
-        ).fetchall()
+        percentage = case(
+            (or_(Score.total_questions.is_(None), Score.total_questions == 0), 0.0),
+            else_=cast(Score.total_scored, Float) * 100 / Score.total_questions
+        )
+        ranked_scores = db.session.query(
+            Subject.id.label('subject_id'),
+            Subject.name.label('subject_name'),
+            User.id.label('user_id'),
+            User.username,
+            User.full_name,
+            Score.total_scored.label('top_score'),
+            func.coalesce(Score.total_questions, 0).label('total_questions'),
+            percentage.label('percentage'),
+            func.row_number().over(
+                partition_by=Subject.id,
+                order_by=(Score.total_scored.desc(), percentage.desc())
+            ).label('rn')
+        ).join(
+            Chapter, Subject.id == Chapter.subject_id
+        ).join(
+            Quiz, Chapter.id == Quiz.chapter_id
+        ).join(
+            Score, Quiz.id == Score.quiz_id
+        ).join(
+            User, Score.user_id == User.id
+        ).filter(
+            Score.total_scored.isnot(None)
+        ).subquery()
+        
+        final_result = db.session.query(ranked_scores).filter(
+            ranked_scores.c.rn == 1
+        ).order_by(
+            ranked_scores.c.subject_name
+        ).all()
         
         subject_top_scores = {}
         for row in final_result:
@@ -145,7 +137,7 @@ def get_subject_top_scores():
                     'full_name': row.full_name,
                     'top_score': row.top_score,
                     'total_questions': row.total_questions,
-                    'percentage': row.percentage
+                    'percentage': round(row.percentage, 2)
                 }
         
         final_result = list(subject_top_scores.values())
@@ -184,13 +176,9 @@ def get_subject_user_attempts():
         subject_user_counts = db.session.query(
             Subject.id.label('subject_id'),
             Subject.name.label('subject_name'),
-            func.count(func.distinct(Score.user_id)).label('unique_users')
-        ).join(
-            Chapter, Subject.id == Chapter.subject_id
+            func.count(func.distinct(ScoreRollup.user_id)).label('unique_users')
         ).join(
-            Quiz, Chapter.id == Quiz.chapter_id
-        ).join(
-            Score, Quiz.id == Score.quiz_id
+            ScoreRollup, Subject.id == ScoreRollup.subject_id
         ).group_by(
             Subject.id, Subject.name
         ).order_by(